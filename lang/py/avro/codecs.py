@@ -84,8 +84,8 @@ class Codec(abc.ABC):
         :type readers_decoder: avro.io.BinaryDecoder
 
         :rtype: avro.io.BinaryDecoder
-        :return: a newly instantiated BinaryDecoder object that contains the
-                 decompressed data which is wrapped by a StringIO
+        :return: a newly instantiated BufferDecoder object that reads the
+                 decompressed data directly from memory
         """
 
 
@@ -94,8 +94,8 @@ class NullCodec(Codec):
         return data, len(data)
 
     def decompress(self, readers_decoder):
-        readers_decoder.skip_long()
-        return readers_decoder
+        # Decode the block in place when readers_decoder reads from memory, such as a memory-mapped file.
+        return avro.io.BufferDecoder(readers_decoder.read_view(readers_decoder.read_long()))
 
 
 class DeflateCodec(Codec):
@@ -108,11 +108,11 @@ class DeflateCodec(Codec):
     def decompress(self, readers_decoder):
         # Compressed data is stored as (length, data), which
         # corresponds to how the "bytes" type is encoded.
-        data = readers_decoder.read_bytes()
+        data = readers_decoder.read_view(readers_decoder.read_long())
         # -15 is the log of the window size; negative indicates
         # "raw" (no zlib headers) decompression.  See zlib.h.
         uncompressed = zlib.decompress(data, -15)
-        return avro.io.BinaryDecoder(io.BytesIO(uncompressed))
+        return avro.io.BufferDecoder(uncompressed)
 
 
 if has_bzip2:
@@ -123,9 +123,9 @@ if has_bzip2:
 
         def decompress(self, readers_decoder):
             length = readers_decoder.read_long()
-            data = readers_decoder.read(length)
+            data = readers_decoder.read_view(length)
             uncompressed = bz2.decompress(data)
-            return avro.io.BinaryDecoder(io.BytesIO(uncompressed))
+            return avro.io.BufferDecoder(uncompressed)
 
 
 if has_snappy:
@@ -143,7 +143,7 @@ if has_snappy:
             uncompressed = snappy.decompress(data)
             checksum = readers_decoder.read(4)
             self.check_crc32(uncompressed, checksum)
-            return avro.io.BinaryDecoder(io.BytesIO(uncompressed))
+            return avro.io.BufferDecoder(uncompressed)
 
         def check_crc32(self, bytes, checksum):
             checksum = STRUCT_CRC32.unpack(checksum)[0]
@@ -159,7 +159,7 @@ if has_zstandard:
 
         def decompress(self, readers_decoder):
             length = readers_decoder.read_long()
-            data = readers_decoder.read(length)
+            data = readers_decoder.read_view(length)
             uncompressed = bytearray()
             dctx = zstd.ZstdDecompressor()
             with dctx.stream_reader(io.BytesIO(data)) as reader:
@@ -168,7 +168,7 @@ if has_zstandard:
                     if not chunk:
                         break
                     uncompressed.extend(chunk)
-            return avro.io.BinaryDecoder(io.BytesIO(uncompressed))
+            return avro.io.BufferDecoder(uncompressed)
 
 
 def get_codec(codec_name):
@@ -21,16 +21,32 @@
 
 """Read/Write Avro File Object Containers."""
 
+import bisect
+import collections
+import concurrent.futures
+import copy
 import io
+import mmap
+import multiprocessing
+import operator
 import os
+import queue
 import random
+import warnings
 import zlib
 
 import avro.codecs
+import avro.constants
 import avro.errors
 import avro.io
 import avro.schema
 
+try:
+    import numpy
+    has_numpy = True
+except ImportError:
+    has_numpy = False
+
 #
 # Constants
 #
@@ -39,6 +55,7 @@ MAGIC = bytes(b'Obj' + bytearray([VERSION]))
 MAGIC_SIZE = len(MAGIC)
 SYNC_SIZE = 16
 SYNC_INTERVAL = 4000 * SYNC_SIZE  # TODO(hammer): make configurable
+SYNC_SCAN_SIZE = 64 * 1024  # bytes read at a time by DataFileReader.sync while looking for a sync marker
 META_SCHEMA = avro.schema.parse("""\
 {"type": "record", "name": "org.apache.avro.file.Header",
  "fields" : [
@@ -47,6 +64,18 @@ META_SCHEMA = avro.schema.parse("""\
    {"name": "sync", "type": {"type": "fixed", "name": "sync", "size": %d}}]}
 """ % (MAGIC_SIZE, SYNC_SIZE))
 
+# The sidecar index of the blocks of a datafile, see BlockIndex.
+INDEX_SCHEMA = avro.schema.parse("""\
+{"type": "record", "name": "avro.datafile.BlockIndex",
+ "fields" : [
+   {"name": "sync", "type": {"type": "fixed", "name": "sync", "size": %d}},
+   {"name": "blocks", "type": {"type": "array", "items": {
+     "type": "record", "name": "Block",
+     "fields": [{"name": "offset", "type": "long"},
+                {"name": "first", "type": "long"},
+                {"name": "count", "type": "long"}]}}}]}
+""" % SYNC_SIZE)
+
 NULL_CODEC = 'null'
 VALID_CODECS = avro.codecs.supported_codec_names()
 VALID_ENCODINGS = ['binary']  # not used yet
@@ -54,6 +83,28 @@ VALID_ENCODINGS = ['binary']  # not used yet
 CODEC_KEY = "avro.codec"
 SCHEMA_KEY = "avro.schema"
 
+# NumPy dtypes of the columns decoded by DataFileReader.iter_columns, keyed on (type, logical type).
+NUMPY_DTYPES = {
+    ('boolean', None): 'bool',
+    ('int', None): 'int32',
+    ('long', None): 'int64',
+    ('float', None): 'float32',
+    ('double', None): 'float64',
+    ('int', avro.constants.DATE): 'datetime64[D]',
+    ('long', avro.constants.TIMESTAMP_MILLIS): 'datetime64[ms]',
+    ('long', avro.constants.TIMESTAMP_MICROS): 'datetime64[us]',
+}
+
+# Readers of the underlying values of the types with a NumPy dtype, ignoring logical types.
+_RAW_READERS = {
+    'null': operator.methodcaller('read_null'),
+    'boolean': operator.methodcaller('read_boolean'),
+    'int': operator.methodcaller('read_long'),
+    'long': operator.methodcaller('read_long'),
+    'float': operator.methodcaller('read_float'),
+    'double': operator.methodcaller('read_double'),
+}
+
 #
 # Write Path
 #
@@ -120,19 +171,29 @@ class _DataFile:
 class DataFileWriter(_DataFile):
 
     # TODO(hammer): make 'encoder' a metadata property
-    def __init__(self, writer, datum_writer, writers_schema=None, codec=NULL_CODEC):
+    def __init__(self, writer, datum_writer, writers_schema=None, codec=NULL_CODEC, compression_workers=0):
         """
         If the schema is not present, presume we're appending.
 
         @param writer: File-like object to write into.
+        @param compression_workers: If positive, full blocks are compressed
+            by a pool of that many threads while the next blocks are
+            encoded, and written to the file in order. The deflate, bzip2
+            and zstandard compressors release the GIL. flush(), sync() and
+            close() wait for the blocks being compressed to be written.
         """
         self._writer = writer
         self._encoder = avro.io.BinaryEncoder(writer)
         self._datum_writer = datum_writer
-        self._buffer_writer = io.BytesIO()
-        self._buffer_encoder = avro.io.BinaryEncoder(self._buffer_writer)
+        self._buffer_encoder = avro.io.BufferEncoder()
         self.block_count = 0
         self._header_written = False
+        self._compression_pool = None
+        # (block count, future of the compressed data and its length) for every block being compressed, in order
+        self._pending_blocks = collections.deque()
+        self._max_pending_blocks = 2 * compression_workers
+        if compression_workers > 0:
+            self._compression_pool = concurrent.futures.ThreadPoolExecutor(compression_workers)
 
         if writers_schema is not None:
             self._sync_marker = generate_sixteen_random_bytes()
@@ -160,9 +221,19 @@ class DataFileWriter(_DataFile):
     writer = property(lambda self: self._writer)
     encoder = property(lambda self: self._encoder)
     datum_writer = property(lambda self: self._datum_writer)
-    buffer_writer = property(lambda self: self._buffer_writer)
     buffer_encoder = property(lambda self: self._buffer_encoder)
 
+    @property
+    def buffer_writer(self):
+        """A BytesIO holding a copy of the block being written, positioned at its end.
+
+        Writing to it doesn't change the block: use buffer_encoder instead.
+        """
+        warnings.warn('DataFileWriter.buffer_writer is deprecated in favor of DataFileWriter.buffer_encoder')
+        buffer_writer = io.BytesIO(self._buffer_encoder.getvalue())
+        buffer_writer.seek(0, io.SEEK_END)
+        return buffer_writer
+
     def _write_header(self):
         header = {'magic': MAGIC,
                   'meta': self.meta,
@@ -188,27 +259,47 @@ class DataFileWriter(_DataFile):
             self._write_header()
 
         if self.block_count > 0:
-            # write number of items in block
-            self.encoder.write_long(self.block_count)
-
-            # write block contents
-            uncompressed_data = self.buffer_writer.getvalue()
             codec = avro.codecs.get_codec(self.codec)
+            if self._compression_pool is not None:
+                # hand the buffer over to the pool and encode the next block into a new one
+                compressed = self._compression_pool.submit(codec.compress, self.buffer_encoder.buffer)
+                self._pending_blocks.append((self.block_count, compressed))
+                self._buffer_encoder = avro.io.BufferEncoder()
+                self.block_count = 0
+                self._write_pending_blocks(self._max_pending_blocks)
+                return
+
+            # write block contents, handing the codec the buffer itself rather than a copy
+            uncompressed_data = self.buffer_encoder.buffer
             compressed_data, compressed_data_length = codec.compress(uncompressed_data)
+            self._write_compressed_block(self.block_count, compressed_data, compressed_data_length)
 
-            # Write length of block
-            self.encoder.write_long(compressed_data_length)
+            # reset buffer
+            self.buffer_encoder.clear()
+            self.block_count = 0
 
-            # Write block
-            self.writer.write(compressed_data)
+    def _write_compressed_block(self, block_count, compressed_data, compressed_data_length):
+        # write number of items in block
+        self.encoder.write_long(block_count)
 
-            # write sync marker
-            self.writer.write(self.sync_marker)
+        # Write length of block
+        self.encoder.write_long(compressed_data_length)
 
-            # reset buffer
-            self.buffer_writer.truncate(0)
-            self.buffer_writer.seek(0)
-            self.block_count = 0
+        # Write block
+        self.writer.write(compressed_data)
+
+        # write sync marker
+        self.writer.write(self.sync_marker)
+
+    def _write_pending_blocks(self, max_pending=0):
+        """
+        Write the blocks compressed by the pool, in order, until at most
+        max_pending are left and the first of them is still being compressed.
+        """
+        pending = self._pending_blocks
+        while pending and (len(pending) > max_pending or pending[0][1].done()):
+            block_count, compressed = pending.popleft()
+            self._write_compressed_block(block_count, *compressed.result())
 
     def append(self, datum):
         """Append a datum to the file."""
@@ -216,7 +307,7 @@ class DataFileWriter(_DataFile):
         self.block_count += 1
 
         # if the data to write is larger than the sync interval, write the block
-        if self.buffer_writer.tell() >= SYNC_INTERVAL:
+        if len(self.buffer_encoder) >= SYNC_INTERVAL:
             self._write_block()
 
     def sync(self):
@@ -226,16 +317,22 @@ class DataFileWriter(_DataFile):
         emitting a synchronization marker.
         """
         self._write_block()
+        self._write_pending_blocks()
         return self.writer.tell()
 
     def flush(self):
         """Flush the current state of the file, including metadata."""
         self._write_block()
+        self._write_pending_blocks()
         self.writer.flush()
 
     def close(self):
         """Close the file."""
-        self.flush()
+        try:
+            self.flush()
+        finally:
+            if self._compression_pool is not None:
+                self._compression_pool.shutdown()
         self.writer.close()
 
 
@@ -244,9 +341,37 @@ class DataFileReader(_DataFile):
     # TODO(hammer): allow user to specify expected schema?
     # TODO(hammer): allow user to specify the encoder
 
-    def __init__(self, reader, datum_reader):
+    def __init__(self, reader, datum_reader, fields=None, start=None, length=None, use_mmap=False):
+        """
+        @param reader: File-like object to read from.
+        @param datum_reader: DatumReader to read the records with.
+        @param fields: If given, dotted paths of the only fields to read (see
+            RecordSchema.project). Records are read with a copy of
+            datum_reader whose reader's schema is the projection of its own
+            onto these fields, so every other field is skipped; a compiled
+            datum_reader precomputes the plan for skipping them. The
+            datum_reader passed in keeps its reader's schema.
+        @param start, length: If given, only read the blocks whose preceding
+            sync marker starts within [start, start + length), like a Hadoop
+            input split. Splitting a file into consecutive ranges reads
+            every block exactly once. start defaults to 0 and length to the
+            rest of the file.
+        @param use_mmap: If True, reader must be a file with a fileno(). It
+            is memory-mapped and read without copying: blocks are located
+            in the mapping and handed to the codec as memoryview slices, so
+            null codec blocks are decoded in place. Only the length of the
+            file when it is opened is mapped.
+        """
         self._reader = reader
-        self._raw_decoder = avro.io.BinaryDecoder(reader)
+        self._mmap = None
+        if use_mmap:
+            self._mmap = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+            self._raw_decoder = avro.io.BufferDecoder(self._mmap)
+            # The raw decoder is file-like: its position is the position in the file.
+            self._input = self._raw_decoder
+        else:
+            self._raw_decoder = avro.io.BinaryDecoder(reader)
+            self._input = reader
         self._datum_decoder = None  # Maybe reset at every block.
         self._datum_reader = datum_reader
 
@@ -258,7 +383,20 @@ class DataFileReader(_DataFile):
 
         # get ready to read
         self.block_count = 0
+        self._data_start = self._block_start = self._input.tell()
+        self._split_end = None
+        if start is not None:
+            self.sync(start)
+        if length is not None:
+            self._split_end = (start or 0) + length
         self.datum_reader.writers_schema = avro.schema.parse(self.schema)
+        if fields is not None:
+            readers_schema = self.datum_reader.readers_schema or self.datum_reader.writers_schema
+            if readers_schema.type != 'record':
+                raise avro.errors.UsageError("Only the fields of a record schema can be projected, not {}".format(readers_schema.type))
+            self._datum_reader = copy.copy(self.datum_reader)
+            self._datum_reader.readers_schema = readers_schema.project(fields)
+        self.datum_reader.check_schemas()
 
     def __iter__(self):
         return self
@@ -274,18 +412,18 @@ class DataFileReader(_DataFile):
         """
         Get file length and leave file cursor where we found it.
         """
-        remember_pos = self.reader.tell()
-        self.reader.seek(0, 2)
-        file_length = self.reader.tell()
-        self.reader.seek(remember_pos)
+        remember_pos = self._input.tell()
+        self._input.seek(0, 2)
+        file_length = self._input.tell()
+        self._input.seek(remember_pos)
         return file_length
 
     def is_EOF(self):
-        return self.reader.tell() == self.file_length
+        return self._input.tell() == self.file_length
 
     def _read_header(self):
         # seek to the beginning of the file to get magic block
-        self.reader.seek(0, 0)
+        self._input.seek(0, 0)
 
         # read header into a dict
         header = self.datum_reader.read_data(
@@ -313,28 +451,441 @@ class DataFileReader(_DataFile):
         Read the length of the sync marker; if it matches the sync marker,
         return True. Otherwise, seek back to where we started and return False.
         """
-        proposed_sync_marker = self.reader.read(SYNC_SIZE)
+        proposed_sync_marker = self._input.read(SYNC_SIZE)
         if proposed_sync_marker != self.sync_marker:
-            self.reader.seek(-SYNC_SIZE, 1)
+            self._input.seek(-SYNC_SIZE, 1)
             return False
         return True
 
-    def __next__(self):
-        """Return the next datum in the file."""
+    def _next_block(self):
+        """
+        Skip the sync marker before the next block, if not skipped already.
+        Return False if the end of the file, or of the split being read, was reached instead.
+        """
+        if self.is_EOF() or (self._skip_sync() and self.is_EOF()):
+            self._block_start = self.file_length
+            return False
+        self._block_start = self._input.tell()
+        return self._split_end is None or not self._is_past(self._split_end)
+
+    def _advance_block(self):
+        """
+        Read block headers until a non-empty block is current.
+        Return False if the end of the file was reached instead.
+        """
         while self.block_count == 0:
-            if self.is_EOF() or (self._skip_sync() and self.is_EOF()):
-                raise StopIteration
+            if not self._next_block():
+                return False
             self._read_block_header()
+        return True
+
+    def seek(self, position):
+        """
+        Move to position, which must be a sync point, as returned by
+        DataFileWriter.sync() or tell(). Reading resumes with the block
+        starting there.
+        """
+        self._input.seek(position)
+        self.block_count = 0
+        self._block_start = position
+
+    def tell(self):
+        """
+        Return the position of the last sync point before the next record
+        to read, which may be passed to seek() to read that block again.
+        """
+        if self.block_count == 0:
+            self._next_block()
+        return self._block_start
+
+    def sync(self, position):
+        """
+        Move to the first sync point after the sync marker starting at or
+        after position, or to the end of the file if there is none.
+        """
+        self._input.seek(position)
+        self.block_count = 0
+        offset = position
+        previous = b''
+        while True:
+            chunk = self._input.read(SYNC_SCAN_SIZE)
+            if not chunk:
+                self._block_start = self.file_length
+                return
+            data = previous + chunk
+            index = data.find(self.sync_marker)
+            if index >= 0:
+                self._block_start = offset - len(previous) + index + SYNC_SIZE
+                self._input.seek(self._block_start)
+                return
+            # keep the tail of this chunk in case a sync marker straddles chunks
+            previous = data[-(SYNC_SIZE - 1):]
+            offset += len(chunk)
+
+    def past_sync(self, position):
+        """
+        Return True if the last sync point is past position, that is if the
+        sync marker before the next block starts at or after position.
+        """
+        self.tell()
+        return self._is_past(position)
+
+    def _is_past(self, position):
+        return self._block_start >= position + SYNC_SIZE or self._block_start >= self.file_length
+
+    def __next__(self):
+        """Return the next datum in the file."""
+        if not self._advance_block():
+            raise StopIteration
 
         datum = self.datum_reader.read(self.datum_decoder)
         self.block_count -= 1
         return datum
 
+    def block_index(self):
+        """
+        Return the BlockIndex of this file, walking the headers of all its
+        blocks without reading or decompressing their data. The reader is
+        left at the first block.
+        """
+        blocks = []
+        first = 0
+        self._input.seek(self._data_start)
+        offset = self._data_start
+        while offset < self.file_length:
+            count = self.raw_decoder.read_long()
+            size = self.raw_decoder.read_long()
+            self._input.seek(size, 1)
+            if self._input.read(SYNC_SIZE) != self.sync_marker:
+                raise avro.errors.DataFileException("No sync marker after the block at {}.".format(offset))
+            if count:
+                blocks.append((offset, first, count))
+                first += count
+            offset = self._input.tell()
+        self.seek(self._data_start)
+        return BlockIndex(self.sync_marker, blocks)
+
+    def seek_record(self, record_number, index):
+        """
+        Move to the record numbered record_number, counting from 0 at the
+        start of the file, so that it is the next record read. Only the
+        block holding it is read, as found in index.
+
+        @param index: The BlockIndex of this file, see block_index().
+        """
+        if index.sync_marker != self.sync_marker:
+            raise avro.errors.DataFileException("The block index is not an index of this file.")
+        offset, first, count = index.find(record_number)
+        self.seek(offset)
+        for _ in range(record_number - first):
+            next(self)
+
+    def _read_raw_block(self):
+        """
+        Read the next non-empty block without decompressing it.
+        Return its record count and its compressed data, length prefix
+        included, or None if the end of the file was reached instead.
+        """
+        while True:
+            if not self._next_block():
+                return None
+            count = self.raw_decoder.read_long()
+            start = self._input.tell()
+            length = self.raw_decoder.read_long()
+            prefix_length = self._input.tell() - start
+            self._input.seek(start)
+            data = self._input.read(prefix_length + length)
+            if count:
+                return count, data
+
+    def iter_parallel(self, workers=None, ordered=True, batches=False):
+        """
+        Yield the rest of the file, decompressing and decoding its blocks in a pool of processes.
+
+        Blocks are read from the file without decompressing them, and sent
+        to the worker processes along with the schemas and the codec. At
+        most two blocks per worker are in flight, so the file isn't read
+        ahead of the records consumed.
+
+        The records must be sent back from the worker processes, so the
+        datum reader can't build lazy records or records of a
+        record_factory. Records of a block partly read already are read
+        in this process first.
+
+        @param workers: The number of worker processes, by default the number of CPUs.
+        @param ordered: If True, blocks are yielded in the order of the file,
+            else as soon as they are decoded.
+        @param batches: If True, yield a list of the records of each block
+            rather than each record.
+        """
+        if self.datum_reader.lazy or self.datum_reader.record_factory is not None:
+            raise avro.errors.UsageError("Records decoded in parallel can't be lazy or built by a record_factory.")
+        if self.block_count:
+            batch = [next(self) for _ in range(self.block_count)]
+            if batches:
+                yield batch
+            else:
+                yield from batch
+        readers_schema = self.datum_reader.readers_schema
+        initargs = (self.codec, str(self.datum_reader.writers_schema),
+                    None if readers_schema is None else str(readers_schema),
+                    self.datum_reader.compiled, self.datum_reader.intern_strings, self.datum_reader.string_cache_size)
+        workers = workers or os.cpu_count() or 1
+        with multiprocessing.Pool(workers, _init_block_decoder, initargs) as pool:
+            if ordered:
+                blocks = self._decode_blocks_ordered(pool, 2 * workers)
+            else:
+                blocks = self._decode_blocks_unordered(pool, 2 * workers)
+            for batch in blocks:
+                if batches:
+                    yield batch
+                else:
+                    yield from batch
+
+    def _decode_blocks_ordered(self, pool, max_pending):
+        pending = collections.deque()
+        while True:
+            while len(pending) < max_pending:
+                block = self._read_raw_block()
+                if block is None:
+                    break
+                pending.append(pool.apply_async(_decode_block, block))
+            if not pending:
+                return
+            yield pending.popleft().get()
+
+    def _decode_blocks_unordered(self, pool, max_pending):
+        done = queue.Queue()
+        pending = 0
+        while True:
+            while pending < max_pending:
+                block = self._read_raw_block()
+                if block is None:
+                    break
+                pool.apply_async(_decode_block, block, callback=done.put, error_callback=done.put)
+                pending += 1
+            if not pending:
+                return
+            batch = done.get()
+            pending -= 1
+            if isinstance(batch, BaseException):
+                raise batch
+            yield batch
+
+    def iter_columns(self, null_masks=True):
+        """
+        Yield the rest of the file one block at a time, decoded into columns.
+
+        Each block is returned as a dict mapping the name of every field of
+        the reader's record schema to a NumPy array holding that field for
+        all the records in the block, without building a dict per record.
+        boolean, int, long, float, double, date and timestamp fields become
+        arrays of the matching dtype (see NUMPY_DTYPES); other fields become
+        object arrays of the usual decoded values.
+
+        @param null_masks: If True, fields of a ["null", T] union with such a
+            T become masked arrays whose mask is set for null values.
+            Otherwise they become object arrays holding None.
+        """
+        if not has_numpy:
+            raise avro.errors.UsageError("Columnar decoding requires numpy. (Is it installed?)")
+        plan = _ColumnPlan(self.datum_reader, null_masks)
+        while self._advance_block():
+            columns = plan.read_block(self.datum_decoder, self.block_count)
+            self.block_count = 0
+            yield columns
+
     def close(self):
         """Close this reader."""
+        if self._mmap is not None:
+            # Drop the views of the mapping before closing it. If lazy records still hold some,
+            # the mapping is closed once they are collected instead.
+            self._raw_decoder = self._datum_decoder = self._input = None
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
         self.reader.close()
 
 
+class BlockIndex:
+    """
+    The offset, the number of the first record and the record count of
+    each non-empty block of a datafile, for DataFileReader.seek_record.
+
+    Indexes are saved to and loaded from sidecar files encoded with
+    INDEX_SCHEMA, which also holds the sync marker of the datafile.
+    """
+
+    def __init__(self, sync_marker, blocks):
+        """
+        @param sync_marker: The sync marker of the datafile.
+        @param blocks: (offset, first record number, record count) of every
+            non-empty block, in the order of the file.
+        """
+        self._sync_marker = sync_marker
+        self._blocks = blocks
+        self._firsts = [first for offset, first, count in blocks]
+
+    # read-only properties
+    sync_marker = property(lambda self: self._sync_marker)
+    blocks = property(lambda self: self._blocks)
+
+    def __len__(self):
+        """The number of records in the datafile."""
+        if not self._blocks:
+            return 0
+        offset, first, count = self._blocks[-1]
+        return first + count
+
+    def find(self, record_number):
+        """Return (offset, first record number, record count) of the block holding record_number."""
+        if not 0 <= record_number < len(self):
+            raise IndexError("No record {} in a datafile of {} records.".format(record_number, len(self)))
+        return self._blocks[bisect.bisect_right(self._firsts, record_number) - 1]
+
+    def write(self, writer):
+        """Write this index to the file-like object writer."""
+        blocks = [{'offset': offset, 'first': first, 'count': count} for offset, first, count in self._blocks]
+        avro.io.DatumWriter().write_data(INDEX_SCHEMA, {'sync': self._sync_marker, 'blocks': blocks},
+                                         avro.io.BinaryEncoder(writer))
+
+    @classmethod
+    def read(cls, reader):
+        """Read an index written by write() from the file-like object reader."""
+        index = avro.io.DatumReader().read_data(INDEX_SCHEMA, INDEX_SCHEMA, avro.io.BufferDecoder(reader.read()))
+        return cls(index['sync'], [(block['offset'], block['first'], block['count']) for block in index['blocks']])
+
+
+# The codec and the datum reader of a worker process of DataFileReader.iter_parallel.
+_block_decoder = None
+
+
+def _init_block_decoder(codec, writers_schema, readers_schema, compiled, intern_strings, string_cache_size):
+    global _block_decoder
+    datum_reader = avro.io.DatumReader(avro.schema.parse(writers_schema),
+                                       None if readers_schema is None else avro.schema.parse(readers_schema),
+                                       compiled=compiled, intern_strings=intern_strings,
+                                       string_cache_size=string_cache_size)
+    _block_decoder = (avro.codecs.get_codec(codec), datum_reader)
+
+
+def _decode_block(count, data):
+    """Decompress a block read by DataFileReader._read_raw_block and return the list of its records."""
+    codec, datum_reader = _block_decoder
+    decoder = codec.decompress(avro.io.BufferDecoder(data))
+    return [datum_reader.read(decoder) for _ in range(count)]
+
+
+def _discard(value):
+    pass
+
+
+def _unwrap_nullable(schema):
+    """Return T and True for a ["null", T] or [T, "null"] union, else schema and False."""
+    if schema.type == 'union' and len(schema.schemas) == 2:
+        types = [s.type for s in schema.schemas]
+        if 'null' in types:
+            return schema.schemas[1 - types.index('null')], True
+    return schema, False
+
+
+def _raw_reader(writers_schema, readers_schema):
+    """Return a function reading the raw value of a field resolved to a NumPy dtype."""
+    if writers_schema.type == 'union':
+        branches = tuple(_raw_reader(s, readers_schema) for s in writers_schema.schemas)
+        return lambda decoder: branches[decoder.read_long()](decoder)
+    if readers_schema.type == 'union':
+        readers_schema = next((s for s in readers_schema.schemas if s.match(writers_schema)), readers_schema)
+    if not readers_schema.match(writers_schema) or writers_schema.type not in _RAW_READERS:
+        def fail(decoder):
+            raise avro.errors.SchemaResolutionException('Schemas do not match.', writers_schema, readers_schema)
+        return fail
+    return _RAW_READERS[writers_schema.type]
+
+
+def _object_array(values):
+    array = numpy.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+class _ColumnPlan:
+    """Decode blocks of records into one NumPy array per field of the reader's schema."""
+
+    def __init__(self, datum_reader, null_masks):
+        writers_schema = datum_reader.writers_schema
+        readers_schema = datum_reader.readers_schema or writers_schema
+        if readers_schema.type != 'record' or writers_schema.type != 'record':
+            raise avro.errors.UsageError("Columnar decoding requires a record schema, not {}".format(readers_schema.type))
+        compiler = avro.io._ReaderCompiler(datum_reader)
+        readers_fields_dict = readers_schema.fields_dict
+        writers_fields_dict = writers_schema.fields_dict
+
+        # (name, dtype, nullable) for every column, in the order of the reader's schema
+        self._columns = []
+        for field in readers_schema.fields:
+            target, nullable = _unwrap_nullable(field.type)
+            dtype = NUMPY_DTYPES.get((target.type, getattr(target, 'logical_type', None)))
+            if nullable and not null_masks:
+                dtype = None
+            self._columns.append((field.name, dtype, nullable))
+        dtypes = {name: dtype for name, dtype, nullable in self._columns}
+
+        # (reader, column index) for every field written, in the order of the writer's schema
+        column_indexes = {field.name: i for i, field in enumerate(readers_schema.fields)}
+        self._steps = []
+        for field in writers_schema.fields:
+            readers_field = readers_fields_dict.get(field.name)
+            if readers_field is None:
+                self._steps.append((compiler.skipper(field.type), None))
+                continue
+            if dtypes[field.name] is None:
+                read = compiler.reader(field.type, readers_field.type)
+            else:
+                read = _raw_reader(field.type, readers_field.type)
+            self._steps.append((read, column_indexes[field.name]))
+
+        # (column index, field) for every field missing from the writer's schema
+        self._field_default = datum_reader._field_default
+        self._defaults = []
+        for i, field in enumerate(readers_schema.fields):
+            if field.name in writers_fields_dict:
+                continue
+            if not field.has_default:
+                fail_msg = 'No default value for field %s' % field.name
+                raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+            self._defaults.append((i, field))
+
+    def read_block(self, decoder, count):
+        """Read count records from decoder and return a dict of columns."""
+        values = [[] for _ in self._columns]
+        steps = [(read, _discard if index is None else values[index].append) for read, index in self._steps]
+        for _ in range(count):
+            for read, append in steps:
+                append(read(decoder))
+        # Mutable defaults are copied for every record, like DatumReader does.
+        for index, field in self._defaults:
+            values[index] = [self._field_default(field) for _ in range(count)]
+        return {name: self._to_array(column, dtype, nullable)
+                for (name, dtype, nullable), column in zip(self._columns, values)}
+
+    @staticmethod
+    def _to_array(values, dtype, nullable):
+        if dtype is None:
+            return _object_array(values)
+        mask = None
+        if nullable:
+            mask = [value is None for value in values]
+            values = [0 if value is None else value for value in values]
+        if dtype.startswith('datetime64'):
+            data = numpy.array(values, dtype=numpy.int64).astype(dtype)
+        else:
+            data = numpy.array(values, dtype=dtype)
+        return data if mask is None else numpy.ma.masked_array(data, mask=mask)
+
+
 def generate_sixteen_random_bytes():
     try:
         return os.urandom(16)
@@ -43,11 +43,24 @@ class IgnoredLogicalType(AvroWarning):
 
 
 class AvroTypeException(AvroException):
-    """Raised when datum is not an example of schema."""
-    def __init__(self, expected_schema, datum):
+    """Raised when datum is not an example of schema.
+
+    path lists the field names, array indexes and map keys leading from
+    the datum being written to the invalid one, when they are known.
+    """
+    def __init__(self, expected_schema, datum, path=None):
         pretty_expected = json.dumps(json.loads(str(expected_schema)), indent=2)
         fail_msg = "The datum {} is not an example of the schema {}".format(datum, pretty_expected)
         super(AvroTypeException, self).__init__(fail_msg)
+        self.expected_schema = expected_schema
+        self.datum = datum
+        self.path = list(path or ())
+
+    def __str__(self):
+        fail_msg = super(AvroTypeException, self).__str__()
+        if self.path:
+            fail_msg += "\nAt path: /{}".format("/".join(str(step) for step in self.path))
+        return fail_msg
 
 
 class SchemaResolutionException(AvroException):
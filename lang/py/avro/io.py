@@ -87,13 +87,18 @@ in that datum, if there are any.
 """
 
 import collections
+import collections.abc
+import copy
 import datetime
 import decimal
+import functools
 import json
+import operator
 import struct
 
 import avro.constants
 import avro.errors
+import avro.schema
 import avro.timezones
 
 #
@@ -108,11 +113,36 @@ STRUCT_SIGNED_SHORT = struct.Struct('>h')    # big-endian signed short
 STRUCT_SIGNED_INT = struct.Struct('>i')      # big-endian signed int
 STRUCT_SIGNED_LONG = struct.Struct('>q')     # big-endian signed long
 
+# Precomputed zig-zag varint encodings of the longs in [-SMALL_LONG_LIMIT, SMALL_LONG_LIMIT).
+SMALL_LONG_LIMIT = 1024
+
+# A string schema property asking DatumReader to intern the strings it reads with it.
+INTERN_STRINGS_PROP = 'avro.python.intern'
+
+
+def _encode_small_long(datum):
+    datum = (datum << 1) ^ (datum >> 63)
+    encoded = bytearray()
+    while (datum & ~0x7F) != 0:
+        encoded.append((datum & 0x7f) | 0x80)
+        datum >>= 7
+    encoded.append(datum)
+    return bytes(encoded)
+
+
+_SMALL_LONG_ENCODINGS = tuple(_encode_small_long(n) for n in range(-SMALL_LONG_LIMIT, SMALL_LONG_LIMIT))
+
 
 #
 # Validate
 #
 
+# How DatumWriter validates the data it writes; see DatumWriter.__init__.
+VALIDATE_FULL = 'full'
+VALIDATE_INLINE = 'inline'
+VALIDATE_NONE = 'none'
+VALIDATION_MODES = (VALIDATE_FULL, VALIDATE_INLINE, VALIDATE_NONE)
+
 
 ValidationNode = collections.namedtuple("ValidationNode", ['schema', 'datum', 'name'])
 
@@ -186,8 +216,9 @@ def _default_iterator(_):
 def _record_iterator(node):
     """Yield each child node of the provided record node."""
     schema, datum, name = node
+    get = _field_getter(datum)
     for field in schema.fields:
-        yield ValidationNode(field.type, datum.get(field.name), field.name)  # type: ignore
+        yield ValidationNode(field.type, get(field.name), field.name)  # type: ignore
 
 
 def _array_iterator(node):
@@ -213,6 +244,16 @@ _ITERATORS = {
 _ITERATORS['error'] = _ITERATORS['request'] = _ITERATORS['record']
 
 
+def _field_getter(datum):
+    """Return a function looking up the values of the fields of the record datum by name.
+
+    Records are dicts, or instances of the classes made by RecordSchema.record_class.
+    """
+    if isinstance(datum, avro.schema.Record):
+        return lambda name: getattr(datum, name, None)
+    return datum.get
+
+
 #
 # Decoder/Encoder
 #
@@ -321,6 +362,13 @@ class BinaryDecoder:
             decimal.getcontext().prec = original_prec
         return scaled_datum
 
+    def read_view(self, n):
+        """
+        Read n bytes, as a bytes-like object that may share the memory of
+        the data being read rather than copy it. Here it is a copy.
+        """
+        return self.read(n)
+
     def read_bytes(self):
         """
         Bytes are encoded as a long followed by that many bytes of data.
@@ -423,6 +471,164 @@ class BinaryDecoder:
         self.reader.seek(self.reader.tell() + n)
 
 
+class BufferDecoder(BinaryDecoder):
+    """Read leaf values directly from an in-memory buffer.
+
+    Values are parsed from a memoryview over the buffer with an integer
+    cursor, instead of one read() call per byte on a file-like object.
+    """
+
+    def __init__(self, buffer, offset=0):
+        """
+        buffer is a bytes-like object: bytes, bytearray, memoryview or mmap.
+        """
+        self._reader = None
+        self._view = memoryview(buffer)
+        self._pos = offset
+
+    # read-only properties
+    buffer = property(lambda self: self._view)
+
+    @property
+    def position(self):
+        """The offset of the next byte to be read."""
+        return self._pos
+
+    def tell(self):
+        """Return the offset of the next byte to be read, like the tell() of a file."""
+        return self._pos
+
+    def seek(self, offset, whence=0):
+        """Move to offset from the start, the current position or the end of the buffer, like the seek() of a file."""
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += len(self._view)
+        self._pos = offset
+        return offset
+
+    def read(self, n):
+        """
+        Read n bytes.
+        """
+        pos = self._pos
+        self._pos = pos + n
+        return bytes(self._view[pos:pos + n])
+
+    def read_view(self, n):
+        """
+        Read n bytes, as a memoryview of the buffer rather than a copy.
+        """
+        pos = self._pos
+        self._pos = pos + n
+        return self._view[pos:pos + n]
+
+    def read_boolean(self):
+        """
+        a boolean is written as a single byte
+        whose value is either 0 (false) or 1 (true).
+        """
+        pos = self._pos
+        self._pos = pos + 1
+        return self._view[pos] == 1
+
+    def read_int(self):
+        """
+        int and long values are written using variable-length, zig-zag coding.
+        """
+        return self.read_long()
+
+    def read_long(self):
+        """
+        int and long values are written using variable-length, zig-zag coding.
+        """
+        view = self._view
+        pos = self._pos
+        b = view[pos]
+        pos += 1
+        n = b & 0x7F
+        shift = 7
+        while (b & 0x80) != 0:
+            b = view[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            shift += 7
+        self._pos = pos
+        return (n >> 1) ^ -(n & 1)
+
+    def read_float(self):
+        """
+        A float is written as 4 bytes.
+        The float is converted into a 32-bit integer using a method equivalent to
+        Java's floatToIntBits and then encoded in little-endian format.
+        """
+        pos = self._pos
+        self._pos = pos + 4
+        return STRUCT_FLOAT.unpack_from(self._view, pos)[0]
+
+    def read_double(self):
+        """
+        A double is written as 8 bytes.
+        The double is converted into a 64-bit integer using a method equivalent to
+        Java's doubleToLongBits and then encoded in little-endian format.
+        """
+        pos = self._pos
+        self._pos = pos + 8
+        return STRUCT_DOUBLE.unpack_from(self._view, pos)[0]
+
+    def read_utf8(self):
+        """
+        A string is encoded as a long followed by
+        that many bytes of UTF-8 encoded character data.
+        """
+        n = self.read_long()
+        pos = self._pos
+        self._pos = pos + n
+        return str(self._view[pos:pos + n], 'utf-8')
+
+    def skip_long(self):
+        view = self._view
+        pos = self._pos
+        while view[pos] & 0x80:
+            pos += 1
+        self._pos = pos + 1
+
+    def skip(self, n):
+        self._pos += n
+
+
+class StringCache:
+    """A bounded cache of the strings read, keyed on their encoded bytes.
+
+    Reading a string already in the cache returns the same str object
+    without decoding it again, which saves time and memory for strings
+    repeated across many records. Once max_size strings are cached, the
+    oldest one is evicted for every new one.
+    """
+
+    def __init__(self, max_size=1024):
+        self._max_size = max_size
+        self._strings = {}
+
+    # read-only properties
+    max_size = property(lambda self: self._max_size)
+
+    def __len__(self):
+        return len(self._strings)
+
+    def read_utf8(self, decoder):
+        """Read a string from decoder, returning the cached str if there is one."""
+        encoded = decoder.read_bytes()
+        strings = self._strings
+        try:
+            return strings[encoded]
+        except KeyError:
+            if len(strings) >= self._max_size:
+                del strings[next(iter(strings))]
+            string = strings[encoded] = encoded.decode('utf-8')
+            return string
+
+
 class BinaryEncoder:
     """Write leaf values."""
 
@@ -463,10 +669,12 @@ class BinaryEncoder:
         int and long values are written using variable-length, zig-zag coding.
         """
         datum = (datum << 1) ^ (datum >> 63)
+        encoded = bytearray()
         while (datum & ~0x7F) != 0:
-            self.write(bytearray([(datum & 0x7f) | 0x80]))
+            encoded.append((datum & 0x7f) | 0x80)
             datum >>= 7
-        self.write(bytearray([datum]))
+        encoded.append(datum)
+        self.write(encoded)
 
     def write_float(self, datum):
         """
@@ -617,40 +825,227 @@ class BinaryEncoder:
         self.write_long(microseconds)
 
 
+class BufferEncoder(BinaryEncoder):
+    """Write leaf values into a single growable bytearray.
+
+    Small longs are appended from a table of precomputed encodings, and
+    the buffer can be handed to a consumer without copying it.
+    """
+
+    def __init__(self, buffer=None):
+        self._writer = None
+        self._buffer = bytearray() if buffer is None else buffer
+
+    # read-only properties
+    buffer = property(lambda self: self._buffer)
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def getvalue(self):
+        """Return a copy of the encoded bytes."""
+        return bytes(self._buffer)
+
+    def clear(self):
+        """Discard the encoded bytes, keeping the same buffer."""
+        del self._buffer[:]
+
+    def write(self, datum):
+        """Write an arbitrary datum."""
+        self._buffer += datum
+
+    def write_boolean(self, datum):
+        """
+        a boolean is written as a single byte
+        whose value is either 0 (false) or 1 (true).
+        """
+        self._buffer.append(1 if datum else 0)
+
+    def write_int(self, datum):
+        """
+        int and long values are written using variable-length, zig-zag coding.
+        """
+        self.write_long(datum)
+
+    def write_long(self, datum):
+        """
+        int and long values are written using variable-length, zig-zag coding.
+        """
+        if -SMALL_LONG_LIMIT <= datum < SMALL_LONG_LIMIT:
+            self._buffer += _SMALL_LONG_ENCODINGS[datum + SMALL_LONG_LIMIT]
+            return
+        buffer = self._buffer
+        datum = (datum << 1) ^ (datum >> 63)
+        while (datum & ~0x7F) != 0:
+            buffer.append((datum & 0x7f) | 0x80)
+            datum >>= 7
+        buffer.append(datum)
+
+    def write_float(self, datum):
+        """
+        A float is written as 4 bytes.
+        The float is converted into a 32-bit integer using a method equivalent to
+        Java's floatToIntBits and then encoded in little-endian format.
+        """
+        self._buffer += STRUCT_FLOAT.pack(datum)
+
+    def write_double(self, datum):
+        """
+        A double is written as 8 bytes.
+        The double is converted into a 64-bit integer using a method equivalent to
+        Java's doubleToLongBits and then encoded in little-endian format.
+        """
+        self._buffer += STRUCT_DOUBLE.pack(datum)
+
+    def write_bytes(self, datum):
+        """
+        Bytes are encoded as a long followed by that many bytes of data.
+        """
+        self.write_long(len(datum))
+        self._buffer += datum
+
+    def write_utf8(self, datum):
+        """
+        A string is encoded as a long followed by
+        that many bytes of UTF-8 encoded character data.
+        """
+        self.write_bytes(datum.encode("utf-8"))
+
+
 #
 # DatumReader/Writer
 #
 class DatumReader:
     """Deserialize Avro-encoded data into a Python data structure."""
 
-    def __init__(self, writers_schema=None, readers_schema=None):
+    def __init__(self, writers_schema=None, readers_schema=None, compiled=False, record_factory=None, lazy=False,
+                 intern_strings=False, string_cache_size=1024):
         """
         As defined in the Avro specification, we call the schema encoded
         in the data the "writer's schema", and the schema expected by the
         reader the "reader's schema".
+
+        If compiled is True, the pair of schemas is compiled once into a
+        resolving reader plan (see _ReaderCompiler) which is used by read()
+        instead of dispatching on the schemas for every datum.
+
+        Records are read as dicts, unless record_factory is given: it is
+        called with a reader's record schema and returns the callable
+        records of that schema are built with, passing the values of the
+        reader's fields in order. avro.schema.RecordSchema.record_class
+        reads records as instances of slotted classes.
+
+        If lazy is True, the schemas must be record schemas and read()
+        returns a LazyRecord, which decodes each field only when it is
+        accessed. Lazy reading requires a BufferDecoder, such as those of
+        the blocks of DataFileReader.
+
+        Strings read with a string schema of the reader's schema that has
+        the property INTERN_STRINGS_PROP set to true, or all strings if
+        intern_strings is True, are interned in a StringCache of at most
+        string_cache_size strings belonging to this reader.
         """
         self._writers_schema = writers_schema
         self._readers_schema = readers_schema
+        self._compiled = compiled
+        self._lazy = lazy
+        self._intern_strings = intern_strings
+        self._string_cache = StringCache(string_cache_size)
+        self._record_factory = record_factory
+        # Keyed on reader's record schema and field ids; they are kept in the values so the ids stay valid.
+        self._record_constructors = {}
+        self._field_defaults = {}
+        # Keyed on the ids of pairs of writer's and reader's schemas, as above.
+        self._resolutions = {}
+        self._checked = False
+        self._plan = None
 
     # read/write properties
     def set_writers_schema(self, writers_schema):
         self._writers_schema = writers_schema
+        self._checked = False
+        self._plan = None
     writers_schema = property(lambda self: self._writers_schema,
                               set_writers_schema)
 
     def set_readers_schema(self, readers_schema):
         self._readers_schema = readers_schema
+        self._checked = False
+        self._plan = None
     readers_schema = property(lambda self: self._readers_schema,
                               set_readers_schema)
 
+    compiled = property(lambda self: self._compiled)
+    lazy = property(lambda self: self._lazy)
+    intern_strings = property(lambda self: self._intern_strings)
+    string_cache = property(lambda self: self._string_cache)
+    string_cache_size = property(lambda self: self._string_cache.max_size)
+    record_factory = property(lambda self: self._record_factory)
+
+    def interns_strings(self, readers_schema):
+        """Return True if strings read with readers_schema are interned in the string cache."""
+        return self._intern_strings or (readers_schema.type == 'string' and
+                                        readers_schema.get_prop(INTERN_STRINGS_PROP) is True)
+
+    def _resolve(self, writers_schema, readers_schema):
+        """Return the schema to read data of writers_schema with, or None if readers_schema doesn't match it.
+
+        That is readers_schema, or its first matching branch if it is a union
+        and writers_schema is not. Results are memoized per pair of schemas.
+        """
+        key = (id(writers_schema), id(readers_schema))
+        try:
+            return self._resolutions[key][2]
+        except KeyError:
+            resolved_schema = readers_schema if readers_schema.match(writers_schema) else None
+            if resolved_schema is not None and writers_schema.type not in ('union', 'error_union') and \
+                    readers_schema.type in ('union', 'error_union'):
+                resolved_schema = next((s for s in readers_schema.schemas if s.match(writers_schema)), None)
+            self._resolutions[key] = (writers_schema, readers_schema, resolved_schema)
+            return resolved_schema
+
+    def record_constructor(self, readers_schema):
+        """Return the callable building records of readers_schema from their field values, or None for dicts."""
+        if self._record_factory is None:
+            return None
+        key = id(readers_schema)
+        if key not in self._record_constructors:
+            self._record_constructors[key] = (readers_schema, self._record_factory(readers_schema))
+        return self._record_constructors[key][1]
+
+    @property
+    def plan(self):
+        """The compiled reader plan for the current pair of schemas."""
+        if self._plan is None:
+            readers_schema = self.readers_schema or self.writers_schema
+            if self._lazy:
+                self._plan = _LazyRecordPlan(self, self.writers_schema, readers_schema)
+            else:
+                self._plan = _ReaderCompiler(self).reader(self.writers_schema, readers_schema)
+        return self._plan
+
+    def check_schemas(self):
+        """Raise SchemaResolutionException if data of the writer's schema can't be read with the reader's schema.
+
+        This is checked once, before the first datum is read. The message
+        of the exception gives the path to the schemas that don't resolve.
+        """
+        _check_resolution(self.writers_schema, self.readers_schema or self.writers_schema)
+        self._checked = True
+
     def read(self, decoder):
         if self.readers_schema is None:
             self.readers_schema = self.writers_schema
+        if not self._checked:
+            self.check_schemas()
+        if self._compiled or self._lazy:
+            return self.plan(decoder)
         return self.read_data(self.writers_schema, self.readers_schema, decoder)
 
     def read_data(self, writers_schema, readers_schema, decoder):
         # schema matching
-        if not readers_schema.match(writers_schema):
+        resolved_schema = self._resolve(writers_schema, readers_schema)
+        if resolved_schema is None:
             fail_msg = 'Schemas do not match.'
             raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
 
@@ -660,21 +1055,16 @@ class DatumReader:
         if writers_schema.type in ['union', 'error_union']:
             return self.read_union(writers_schema, readers_schema, decoder)
 
-        if readers_schema.type in ['union', 'error_union']:
-            # schema resolution: reader's schema is a union, writer's schema is not
-            for s in readers_schema.schemas:
-                if s.match(writers_schema):
-                    return self.read_data(writers_schema, s, decoder)
-
-            # This shouldn't happen because of the match check at the start of this method.
-            fail_msg = 'Schemas do not match.'
-            raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+        # schema resolution: if the reader's schema is a union, resolved_schema is its matching branch
+        readers_schema = resolved_schema
 
         if writers_schema.type == 'null':
             return decoder.read_null()
         elif writers_schema.type == 'boolean':
             return decoder.read_boolean()
         elif writers_schema.type == 'string':
+            if self.interns_strings(readers_schema):
+                return self._string_cache.read_utf8(decoder)
             return decoder.read_utf8()
         elif writers_schema.type == 'int':
             if logical_type == avro.constants.DATE:
@@ -773,15 +1163,16 @@ class DatumReader:
         """
         # read data
         index_of_symbol = decoder.read_int()
-        if index_of_symbol >= len(writers_schema.symbols):
+        reader_symbols = readers_schema.reader_symbols(writers_schema)
+        if not 0 <= index_of_symbol < len(reader_symbols):
             fail_msg = "Can't access enum index %d for enum with %d symbols"\
-                       % (index_of_symbol, len(writers_schema.symbols))
+                       % (index_of_symbol, len(reader_symbols))
             raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
-        read_symbol = writers_schema.symbols[index_of_symbol]
 
         # schema resolution
-        if read_symbol not in readers_schema.symbols:
-            fail_msg = "Symbol %s not present in Reader's Schema" % read_symbol
+        read_symbol = reader_symbols[index_of_symbol]
+        if read_symbol is None:
+            fail_msg = "Symbol %s not present in Reader's Schema" % writers_schema.symbols[index_of_symbol]
             raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
 
         return read_symbol
@@ -929,18 +1320,35 @@ class DatumReader:
             for field_name, field in readers_fields_dict.items():
                 if field_name not in writers_fields_dict:
                     if field.has_default:
-                        field_val = self._read_default_value(field.type, field.default)
+                        field_val = self._field_default(field)
                         read_record[field.name] = field_val
                     else:
                         fail_msg = 'No default value for field %s' % field_name
                         raise avro.errors.SchemaResolutionException(fail_msg, writers_schema,
                                                                     readers_schema)
+        constructor = self.record_constructor(readers_schema)
+        if constructor is not None:
+            return constructor(*[read_record[field.name] for field in readers_schema.fields])
         return read_record
 
     def skip_record(self, writers_schema, decoder):
         for field in writers_schema.fields:
             self.skip_data(field.type, decoder)
 
+    def _field_default(self, field):
+        """Return the default value of field as a datum.
+
+        The default is converted from JSON once per field. Lists, dicts and
+        records are mutable, so a copy of them is returned every time.
+        """
+        try:
+            default, mutable = self._field_defaults[id(field)][1:]
+        except KeyError:
+            default = self._read_default_value(field.type, field.default)
+            mutable = isinstance(default, (list, dict, avro.schema.Record))
+            self._field_defaults[id(field)] = (field, default, mutable)
+        return copy.deepcopy(default) if mutable else default
+
     def _read_default_value(self, field_schema, default_value):
         """
         Basically a JSON Decoder?
@@ -979,6 +1387,9 @@ class DatumReader:
                     json_val = field.default
                 field_val = self._read_default_value(field.type, json_val)
                 read_record[field.name] = field_val
+            constructor = self.record_constructor(field_schema)
+            if constructor is not None:
+                return constructor(*[read_record[field.name] for field in field_schema.fields])
             return read_record
         else:
             fail_msg = 'Unknown type: %s' % field_schema.type
@@ -988,20 +1399,69 @@ class DatumReader:
 class DatumWriter:
     """DatumWriter for generic python objects."""
 
-    def __init__(self, writers_schema=None):
+    def __init__(self, writers_schema=None, compiled=False, sized_blocks=False, max_block_count=None,
+                 validation=VALIDATE_FULL):
+        """
+        If compiled is True, the writer's schema is compiled once into an
+        encoder plan (see _WriterCompiler) which is used by write() instead
+        of dispatching on the schema for every datum.
+
+        If sized_blocks is True, arrays and maps are written as blocks with
+        a negative count followed by the block's size in bytes, which lets
+        readers skip them without decoding their items. If max_block_count
+        is given, arrays and maps are split into blocks of at most that many
+        items.
+
+        validation is one of:
+          VALIDATE_FULL: the whole datum is validated before it is encoded.
+          VALIDATE_INLINE: every value is validated as it is encoded, so the
+            datum is traversed once. An invalid datum raises
+            AvroTypeException with the path to the invalid value, but part
+            of it may have been written to the encoder already.
+          VALIDATE_NONE: the datum is trusted to be valid and is not
+            checked. Invalid data may raise arbitrary errors or be encoded
+            incorrectly.
+        """
+        if validation not in VALIDATION_MODES:
+            raise avro.errors.UsageError('Unknown validation mode: {!r}'.format(validation))
         self._writers_schema = writers_schema
+        self._compiled = compiled
+        self._sized_blocks = sized_blocks
+        self._max_block_count = max_block_count
+        self._validation = validation
+        self._inline_validation = validation == VALIDATE_INLINE
+        self._plan = None
 
     # read/write properties
     def set_writers_schema(self, writers_schema):
         self._writers_schema = writers_schema
+        self._plan = None
     writers_schema = property(lambda self: self._writers_schema,
                               set_writers_schema)
 
+    compiled = property(lambda self: self._compiled)
+    validation = property(lambda self: self._validation)
+
+    @property
+    def plan(self):
+        """The compiled encoder plan for the current writer's schema."""
+        if self._plan is None:
+            compiler = _WriterCompiler(self._sized_blocks, self._max_block_count, self._inline_validation)
+            self._plan = compiler.writer(self.writers_schema)
+        return self._plan
+
     def write(self, datum, encoder):
-        validate(self.writers_schema, datum, raise_on_error=True)
-        self.write_data(self.writers_schema, datum, encoder)
+        if self._validation == VALIDATE_FULL:
+            validate(self.writers_schema, datum, raise_on_error=True)
+        if self._compiled:
+            self.plan(datum, encoder)
+        else:
+            self.write_data(self.writers_schema, datum, encoder)
 
     def write_data(self, writers_schema, datum, encoder):
+        if (self._inline_validation and writers_schema.type not in ('union', 'error_union') and
+                writers_schema.validate(datum) is None):
+            raise avro.errors.AvroTypeException(writers_schema, datum)
         # function dispatch to write datum
         logical_type = getattr(writers_schema, 'logical_type', None)
         if writers_schema.type == 'null':
@@ -1070,7 +1530,7 @@ class DatumWriter:
         An enum is encoded by a int, representing the zero-based position
         of the symbol in the schema.
         """
-        index_of_datum = writers_schema.symbols.index(datum)
+        index_of_datum = writers_schema.symbol_index(datum)
         encoder.write_int(index_of_datum)
 
     def write_array(self, writers_schema, datum, encoder):
@@ -1088,10 +1548,19 @@ class DatumWriter:
         The actual count in this case
         is the absolute value of the count written.
         """
+        if self._sized_blocks or self._max_block_count:
+            def write_item(item, encoder):
+                self.write_data(writers_schema.items, item, encoder)
+            _write_blocks(datum, write_item, encoder, self._sized_blocks, self._max_block_count)
+            return
         if len(datum) > 0:
             encoder.write_long(len(datum))
-            for item in datum:
-                self.write_data(writers_schema.items, item, encoder)
+            try:
+                for item in datum:
+                    self.write_data(writers_schema.items, item, encoder)
+            except avro.errors.AvroTypeException as e:
+                e.path.insert(0, _index_of(datum, item))
+                raise
         encoder.write_long(0)
 
     def write_map(self, writers_schema, datum, encoder):
@@ -1109,11 +1578,22 @@ class DatumWriter:
         The actual count in this case
         is the absolute value of the count written.
         """
+        if self._sized_blocks or self._max_block_count:
+            def write_entry(entry, encoder):
+                encoder.write_utf8(entry[0])
+                self.write_data(writers_schema.values, entry[1], encoder)
+            _write_blocks(list(datum.items()), write_entry, encoder, self._sized_blocks, self._max_block_count,
+                          keyed=True)
+            return
         if len(datum) > 0:
             encoder.write_long(len(datum))
-            for key, val in datum.items():
-                encoder.write_utf8(key)
-                self.write_data(writers_schema.values, val, encoder)
+            try:
+                for key, val in datum.items():
+                    encoder.write_utf8(key)
+                    self.write_data(writers_schema.values, val, encoder)
+            except avro.errors.AvroTypeException as e:
+                e.path.insert(0, key)
+                raise
         encoder.write_long(0)
 
     def write_union(self, writers_schema, datum, encoder):
@@ -1123,11 +1603,8 @@ class DatumWriter:
         The value is then encoded per the indicated schema within the union.
         """
         # resolve union
-        index_of_schema = -1
-        for i, candidate_schema in enumerate(writers_schema.schemas):
-            if validate(candidate_schema, datum):
-                index_of_schema = i
-        if index_of_schema < 0:
+        index_of_schema = writers_schema.branch_index(datum)
+        if index_of_schema is None:
             raise avro.errors.AvroTypeException(writers_schema, datum)
 
         # write data
@@ -1141,5 +1618,780 @@ class DatumWriter:
         is encoded as just the concatenation of the encodings of its fields.
         Field values are encoded per their schema.
         """
-        for field in writers_schema.fields:
-            self.write_data(field.type, datum.get(field.name), encoder)
+        get = _field_getter(datum)
+        try:
+            for field in writers_schema.fields:
+                self.write_data(field.type, get(field.name), encoder)
+        except avro.errors.AvroTypeException as e:
+            e.path.insert(0, field.name)
+            raise
+
+
+#
+# Single-object encoding
+#
+
+# Marks data encoded as single objects, before the fingerprint of their schema.
+SINGLE_OBJECT_MAGIC = b'\xc3\x01'
+
+
+class SchemaStore:
+    """Schemas keyed on their CRC-64-AVRO fingerprints, as needed to decode single objects.
+
+    If find is given, it is called with the fingerprints not in the store,
+    for instance to fetch them from a schema registry, and returns a schema
+    or None. Schemas found are added to the store.
+    """
+
+    def __init__(self, schemas=(), find=None):
+        self._schemas = {}
+        self._find = find
+        for schema in schemas:
+            self.add(schema)
+
+    def add(self, schema):
+        """Add schema to the store and return its fingerprint."""
+        fingerprint = schema.fingerprint()
+        self._schemas[fingerprint] = schema
+        return fingerprint
+
+    def get(self, fingerprint):
+        """Return the schema with the given fingerprint, or None if it is unknown."""
+        schema = self._schemas.get(fingerprint)
+        if schema is None and self._find is not None:
+            schema = self._find(fingerprint)
+            if schema is not None:
+                self._schemas[fingerprint] = schema
+        return schema
+
+
+class SingleObjectEncoder:
+    """Encode data as single objects: the marker, the fingerprint of the writer's schema, then the datum.
+
+    datum_writer defaults to a compiled DatumWriter for writers_schema.
+    """
+
+    def __init__(self, writers_schema, datum_writer=None):
+        self._writers_schema = writers_schema
+        self._datum_writer = datum_writer or DatumWriter(writers_schema, compiled=True)
+        self._header = SINGLE_OBJECT_MAGIC + writers_schema.fingerprint()
+
+    # read-only properties
+    writers_schema = property(lambda self: self._writers_schema)
+    datum_writer = property(lambda self: self._datum_writer)
+
+    def encode(self, datum):
+        """Return datum encoded as a single object, as bytes."""
+        encoder = BufferEncoder(bytearray(self._header))
+        self._datum_writer.write(datum, encoder)
+        return encoder.getvalue()
+
+
+class SingleObjectDecoder:
+    """Decode single objects, looking their writer's schemas up in a schema store.
+
+    The schema store is anything with a get(fingerprint) method returning
+    a schema or None, like SchemaStore. Data is read with readers_schema,
+    or with the writer's schema if it is None. A compiled DatumReader is
+    kept for every writer's schema fingerprint seen.
+    """
+
+    def __init__(self, schema_store, readers_schema=None):
+        self._schema_store = schema_store
+        self._readers_schema = readers_schema
+        self._datum_readers = {}
+
+    # read-only properties
+    schema_store = property(lambda self: self._schema_store)
+    readers_schema = property(lambda self: self._readers_schema)
+
+    def decode(self, message):
+        """Return the datum encoded as a single object in the bytes-like message."""
+        if message[:2] != SINGLE_OBJECT_MAGIC:
+            raise avro.errors.AvroException('Not a single-object encoded message: bad marker %r' % bytes(message[:2]))
+        fingerprint = bytes(message[2:10])
+        datum_reader = self._datum_readers.get(fingerprint)
+        if datum_reader is None:
+            writers_schema = self._schema_store.get(fingerprint)
+            if writers_schema is None:
+                raise avro.errors.AvroException('No schema with fingerprint %s' % fingerprint.hex())
+            datum_reader = self._datum_readers[fingerprint] = DatumReader(writers_schema, self._readers_schema, compiled=True)
+        return datum_reader.read(BufferDecoder(message, 10))
+
+
+#
+# Compiled reader plans
+#
+
+_SCHEMA_RESOLUTION_FAILED = 'Schemas do not match.'
+
+
+def _raise_resolution_error(fail_msg, writers_schema, readers_schema):
+    """Return a plan that raises SchemaResolutionException when it is executed."""
+    def fail(decoder):
+        raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+    return fail
+
+
+def _check_resolution(writers_schema, readers_schema, path=(), seen=None):
+    """Raise SchemaResolutionException if no data of writers_schema can be read with readers_schema.
+
+    Which branch of a writer's union is written is only known from the data,
+    so a union only fails when none of its branches can be read. path holds
+    the field names, [] for array items and {} for map values leading to the
+    schemas, and is given in the exception's message.
+
+    seen holds the pairs of schemas being checked or found to resolve, in
+    the order they were checked. A pair met again while it is being checked
+    is assumed to resolve, so that recursive schemas terminate. When a pair
+    fails, it and the pairs checked after it are forgotten, as they may only
+    have resolved under that assumption and will be checked again if met.
+    """
+    seen = {} if seen is None else seen
+    key = (id(writers_schema), id(readers_schema))
+    if key in seen:
+        return
+    start = len(seen)
+    seen[key] = None
+    try:
+        _check_pair_resolution(writers_schema, readers_schema, path, seen)
+    except avro.errors.SchemaResolutionException:
+        for checked in list(seen)[start:]:
+            del seen[checked]
+        raise
+
+
+def _check_pair_resolution(writers_schema, readers_schema, path, seen):
+    """Check one pair of schemas for _check_resolution, which checks the schemas they are made of."""
+    def fail(fail_msg):
+        fail_msg = '%s at /%s' % (fail_msg, '/'.join(path))
+        raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+
+    if not readers_schema.match(writers_schema):
+        fail(_SCHEMA_RESOLUTION_FAILED)
+    if writers_schema.type in ('union', 'error_union'):
+        errors = []
+        for branch in writers_schema.schemas:
+            try:
+                _check_resolution(branch, readers_schema, path, seen)
+                return
+            except avro.errors.SchemaResolutionException as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        return
+    if readers_schema.type in ('union', 'error_union'):
+        readers_schema = next(s for s in readers_schema.schemas if s.match(writers_schema))
+    if writers_schema.type == 'array':
+        _check_resolution(writers_schema.items, readers_schema.items, path + ('[]',), seen)
+    elif writers_schema.type == 'map':
+        _check_resolution(writers_schema.values, readers_schema.values, path + ('{}',), seen)
+    elif writers_schema.type in ('record', 'error', 'request'):
+        writers_fields_dict = writers_schema.fields_dict
+        for field in readers_schema.fields:
+            writers_field = writers_fields_dict.get(field.name)
+            if writers_field is not None:
+                _check_resolution(writers_field.type, field.type, path + (field.name,), seen)
+            elif not field.has_default:
+                fail('No default value for field %s' % field.name)
+
+
+class _ReaderCompiler:
+    """Compile a writer's and reader's schema pair into a tree of closures.
+
+    Every node of the resulting plan is a callable taking a decoder. The
+    plan performs schema resolution, promotion, defaults and skipping
+    with all dispatch on schema types done once, when compiling, so no
+    match() or type checks happen per datum.
+
+    Records are compiled to generated Python functions that read every
+    field into a local and build the resulting dict in one expression.
+    """
+
+    _PRIMITIVE_READERS = {
+        'null': operator.methodcaller('read_null'),
+        'boolean': operator.methodcaller('read_boolean'),
+        'string': operator.methodcaller('read_utf8'),
+        'int': operator.methodcaller('read_int'),
+        'long': operator.methodcaller('read_long'),
+        'float': operator.methodcaller('read_float'),
+        'double': operator.methodcaller('read_double'),
+        'bytes': operator.methodcaller('read_bytes'),
+    }
+
+    _LOGICAL_READERS = {
+        ('int', avro.constants.DATE): operator.methodcaller('read_date_from_int'),
+        ('int', avro.constants.TIME_MILLIS): operator.methodcaller('read_time_millis_from_int'),
+        ('long', avro.constants.TIME_MICROS): operator.methodcaller('read_time_micros_from_long'),
+        ('long', avro.constants.TIMESTAMP_MILLIS): operator.methodcaller('read_timestamp_millis_from_long'),
+        ('long', avro.constants.TIMESTAMP_MICROS): operator.methodcaller('read_timestamp_micros_from_long'),
+    }
+
+    _PRIMITIVE_SKIPPERS = {
+        'null': operator.methodcaller('skip_null'),
+        'boolean': operator.methodcaller('skip_boolean'),
+        'string': operator.methodcaller('skip_utf8'),
+        'int': operator.methodcaller('skip_int'),
+        'long': operator.methodcaller('skip_long'),
+        'float': operator.methodcaller('skip_float'),
+        'double': operator.methodcaller('skip_double'),
+        'bytes': operator.methodcaller('skip_bytes'),
+    }
+
+    def __init__(self, datum_reader):
+        """
+        datum_reader supplies _field_default for fields only present in
+        the reader's schema.
+        """
+        self._datum_reader = datum_reader
+        # Keyed on schema ids; the schemas are kept in the values so the ids stay valid.
+        self._readers = {}
+        self._skippers = {}
+
+    def reader(self, writers_schema, readers_schema):
+        """Return a plan reading data written with writers_schema as readers_schema."""
+        key = (id(writers_schema), id(readers_schema))
+        if key not in self._readers:
+            # Placeholder so recursive schemas resolve to the plan under construction.
+            plan = []
+            self._readers[key] = (writers_schema, readers_schema, lambda decoder: plan[0](decoder))
+            plan.append(self._compile_reader(writers_schema, readers_schema))
+            self._readers[key] = (writers_schema, readers_schema, plan[0])
+        return self._readers[key][2]
+
+    def skipper(self, writers_schema):
+        """Return a plan skipping over data written with writers_schema."""
+        key = id(writers_schema)
+        if key not in self._skippers:
+            plan = []
+            self._skippers[key] = (writers_schema, lambda decoder: plan[0](decoder))
+            plan.append(self._compile_skipper(writers_schema))
+            self._skippers[key] = (writers_schema, plan[0])
+        return self._skippers[key][1]
+
+    def _compile_reader(self, writers_schema, readers_schema):
+        if not readers_schema.match(writers_schema):
+            return _raise_resolution_error(_SCHEMA_RESOLUTION_FAILED, writers_schema, readers_schema)
+
+        if writers_schema.type in ('union', 'error_union'):
+            return self._compile_union_reader(writers_schema, readers_schema)
+
+        if readers_schema.type in ('union', 'error_union'):
+            # schema resolution: reader's schema is a union, writer's schema is not
+            for s in readers_schema.schemas:
+                if s.match(writers_schema):
+                    return self.reader(writers_schema, s)
+            return _raise_resolution_error(_SCHEMA_RESOLUTION_FAILED, writers_schema, readers_schema)
+
+        type_ = writers_schema.type
+        logical_type = getattr(writers_schema, 'logical_type', None)
+        if (type_, logical_type) in self._LOGICAL_READERS:
+            return self._LOGICAL_READERS[type_, logical_type]
+        if type_ == 'bytes' and logical_type == avro.constants.DECIMAL:
+            return operator.methodcaller('read_decimal_from_bytes',
+                                         writers_schema.get_prop('precision'),
+                                         writers_schema.get_prop('scale'))
+        if type_ == 'string' and self._datum_reader.interns_strings(readers_schema):
+            return self._datum_reader.string_cache.read_utf8
+        if type_ in self._PRIMITIVE_READERS:
+            return self._PRIMITIVE_READERS[type_]
+        if type_ == 'fixed':
+            if logical_type == avro.constants.DECIMAL:
+                return operator.methodcaller('read_decimal_from_fixed',
+                                             writers_schema.get_prop('precision'),
+                                             writers_schema.get_prop('scale'),
+                                             writers_schema.size)
+            return operator.methodcaller('read', writers_schema.size)
+        if type_ == 'enum':
+            return self._compile_enum_reader(writers_schema, readers_schema)
+        if type_ == 'array':
+            return self._compile_array_reader(self.reader(writers_schema.items, readers_schema.items))
+        if type_ == 'map':
+            return self._compile_map_reader(self.reader(writers_schema.values, readers_schema.values))
+        if type_ in ('record', 'error', 'request'):
+            return self._compile_record_reader(writers_schema, readers_schema)
+        fail_msg = "Cannot read unknown schema type: %s" % type_
+        raise avro.errors.AvroException(fail_msg)
+
+    def _compile_enum_reader(self, writers_schema, readers_schema):
+        reader_symbols = readers_schema.reader_symbols(writers_schema)
+
+        def read_enum(decoder):
+            index_of_symbol = decoder.read_int()
+            if not 0 <= index_of_symbol < len(reader_symbols):
+                fail_msg = "Can't access enum index %d for enum with %d symbols" % (index_of_symbol, len(reader_symbols))
+                raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+            read_symbol = reader_symbols[index_of_symbol]
+            if read_symbol is None:
+                fail_msg = "Symbol %s not present in Reader's Schema" % writers_schema.symbols[index_of_symbol]
+                raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+            return read_symbol
+        return read_enum
+
+    @staticmethod
+    def _compile_array_reader(read_item):
+        def read_array(decoder):
+            read_items = []
+            append = read_items.append
+            block_count = decoder.read_long()
+            while block_count != 0:
+                if block_count < 0:
+                    block_count = -block_count
+                    decoder.skip_long()  # block size
+                for i in range(block_count):
+                    append(read_item(decoder))
+                block_count = decoder.read_long()
+            return read_items
+        return read_array
+
+    @staticmethod
+    def _compile_map_reader(read_value):
+        def read_map(decoder):
+            read_items = {}
+            block_count = decoder.read_long()
+            while block_count != 0:
+                if block_count < 0:
+                    block_count = -block_count
+                    decoder.skip_long()  # block size
+                for i in range(block_count):
+                    key = decoder.read_utf8()
+                    read_items[key] = read_value(decoder)
+                block_count = decoder.read_long()
+            return read_items
+        return read_map
+
+    def _compile_union_reader(self, writers_schema, readers_schema):
+        branches = tuple(self.reader(s, readers_schema) for s in writers_schema.schemas)
+
+        def read_union(decoder):
+            index_of_schema = decoder.read_long()
+            if not 0 <= index_of_schema < len(branches):
+                fail_msg = "Can't access branch index %d for union with %d branches" % (index_of_schema, len(branches))
+                raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+            return branches[index_of_schema](decoder)
+        return read_union
+
+    def _compile_record_reader(self, writers_schema, readers_schema):
+        readers_fields_dict = readers_schema.fields_dict
+        writers_fields_dict = writers_schema.fields_dict
+        namespace = {}
+        body = []
+        # The expression of the value of each reader's field.
+        values = {}
+        for i, field in enumerate(writers_schema.fields):
+            readers_field = readers_fields_dict.get(field.name)
+            if readers_field is None:
+                namespace['skip%d' % i] = self.skipper(field.type)
+                body.append('    skip%d(decoder)' % i)
+            else:
+                namespace['read%d' % i] = self.reader(field.type, readers_field.type)
+                body.append('    value%d = read%d(decoder)' % (i, i))
+                values[field.name] = 'value%d' % i
+        for i, (field_name, field) in enumerate(readers_fields_dict.items()):
+            if field_name in writers_fields_dict:
+                continue
+            if not field.has_default:
+                fail_msg = 'No default value for field %s' % field_name
+                return _raise_resolution_error(fail_msg, writers_schema, readers_schema)
+            namespace['default%d' % i] = functools.partial(self._datum_reader._field_default, field)
+            values[field_name] = 'default%d()' % i
+        constructor = self._datum_reader.record_constructor(readers_schema)
+        if constructor is not None:
+            namespace['constructor'] = constructor
+            body.append('    return constructor(%s)' % ', '.join(values[field.name] for field in readers_schema.fields))
+        else:
+            body.append('    return {%s}' % ', '.join('%r: %s' % item for item in values.items()))
+        source = 'def read_record(decoder):\n%s\n' % '\n'.join(body)
+        exec(compile(source, '<avro record reader %s>' % getattr(readers_schema, 'fullname', None), 'exec'), namespace)
+        return namespace['read_record']
+
+    def _compile_skipper(self, writers_schema):
+        type_ = writers_schema.type
+        size = _encoded_size(writers_schema)
+        if size is not None and type_ not in ('null', 'boolean', 'float', 'double'):
+            return operator.methodcaller('skip', size)
+        if type_ in self._PRIMITIVE_SKIPPERS:
+            return self._PRIMITIVE_SKIPPERS[type_]
+        if type_ == 'fixed':
+            return operator.methodcaller('skip', writers_schema.size)
+        if type_ == 'enum':
+            return self._PRIMITIVE_SKIPPERS['int']
+        if type_ == 'array':
+            return self._compile_block_skipper(self.skipper(writers_schema.items), _encoded_size(writers_schema.items))
+        if type_ == 'map':
+            skip_value = self.skipper(writers_schema.values)
+
+            def skip_entry(decoder):
+                decoder.skip_utf8()
+                skip_value(decoder)
+            return self._compile_block_skipper(skip_entry, None)
+        if type_ in ('union', 'error_union'):
+            branches = tuple(self.skipper(s) for s in writers_schema.schemas)
+
+            def skip_union(decoder):
+                index_of_schema = decoder.read_long()
+                if not 0 <= index_of_schema < len(branches):
+                    fail_msg = "Can't access branch index %d for union with %d branches" % (index_of_schema, len(branches))
+                    raise avro.errors.SchemaResolutionException(fail_msg, writers_schema)
+                branches[index_of_schema](decoder)
+            return skip_union
+        if type_ in ('record', 'error', 'request'):
+            field_skippers = tuple(self.skipper(field.type) for field in writers_schema.fields)
+
+            def skip_record(decoder):
+                for skip_field in field_skippers:
+                    skip_field(decoder)
+            return skip_record
+        fail_msg = "Unknown schema type: %s" % type_
+        raise avro.errors.AvroException(fail_msg)
+
+    @staticmethod
+    def _compile_block_skipper(skip_item, item_size):
+        """
+        Blocks with a byte size are skipped in one jump, as are blocks of
+        items whose encoding has a fixed size.
+        """
+        def skip_blocks(decoder):
+            block_count = decoder.read_long()
+            while block_count != 0:
+                if block_count < 0:
+                    decoder.skip(decoder.read_long())
+                elif item_size is not None:
+                    decoder.skip(block_count * item_size)
+                else:
+                    for i in range(block_count):
+                        skip_item(decoder)
+                block_count = decoder.read_long()
+        return skip_blocks
+
+
+def _encoded_size(writers_schema, _seen=None):
+    """Return the number of bytes every datum of writers_schema is encoded in, or None if it varies."""
+    type_ = writers_schema.type
+    if type_ in _FIXED_ENCODED_SIZES:
+        return _FIXED_ENCODED_SIZES[type_]
+    if type_ == 'fixed':
+        return writers_schema.size
+    if type_ in ('record', 'error', 'request'):
+        seen = _seen or set()
+        if id(writers_schema) in seen:
+            return None  # recursive records have no fixed size
+        seen.add(id(writers_schema))
+        sizes = [_encoded_size(field.type, seen) for field in writers_schema.fields]
+        seen.discard(id(writers_schema))
+        return None if None in sizes else sum(sizes)
+    return None
+
+
+_FIXED_ENCODED_SIZES = {
+    'null': 0,
+    'boolean': 1,
+    'float': 4,
+    'double': 8,
+}
+
+
+def _write_blocks(items, write_item, encoder, sized_blocks, max_block_count, keyed=False):
+    """Write the list items as the blocks of an array or map, ending with an empty block.
+
+    If sized_blocks is True, every block is encoded into its own buffer first so
+    its negative count can be followed by its size in bytes. If max_block_count is
+    given, items are split into blocks of at most that many items. If keyed is
+    True, items are the (key, value) pairs of a map.
+    """
+    # An empty list is written as the final empty block alone.
+    block_count = max_block_count or len(items) or 1
+    try:
+        for start in range(0, len(items), block_count):
+            block = items[start:start + block_count]
+            if sized_blocks:
+                block_encoder = BufferEncoder()
+                for item in block:
+                    write_item(item, block_encoder)
+                encoder.write_long(-len(block))
+                encoder.write_long(len(block_encoder))
+                encoder.write(block_encoder.buffer)
+            else:
+                encoder.write_long(len(block))
+                for item in block:
+                    write_item(item, encoder)
+    except avro.errors.AvroTypeException as e:
+        e.path.insert(0, item[0] if keyed else _index_of(items, item))
+        raise
+    encoder.write_long(0)
+
+
+def _index_of(items, item):
+    """Return the position of the first occurrence of the object item in items.
+
+    Used to find which item of an array failed to encode without counting
+    positions while encoding: an item repeated earlier would have failed there.
+    """
+    for i, candidate in enumerate(items):
+        if candidate is item:
+            return i
+
+
+#
+# Lazy records
+#
+
+class LazyRecord(collections.abc.Mapping):
+    """A read-only record decoding the value of each field when it is first accessed.
+
+    A lazy record keeps a reference to the buffer it was read from, and
+    the offset of each of its encoded fields. Decoded values are cached.
+    Keeping a lazy record keeps its whole buffer, e.g. a data file block,
+    in memory.
+    """
+    __slots__ = ('_buffer', '_offsets', '_plan', '_values')
+
+    def __init__(self, buffer, offsets, plan):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._plan = plan
+        self._values = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            value = self._values[name] = self._plan.read_field(name, self._buffer, self._offsets)
+            return value
+
+    def __iter__(self):
+        return iter(self._plan.names)
+
+    def __len__(self):
+        return len(self._plan.names)
+
+    def __repr__(self):
+        return 'LazyRecord(%r)' % dict(self)
+
+
+class _LazyRecordPlan:
+    """Read records as LazyRecords by skipping over their fields, noting where each one starts."""
+
+    def __init__(self, datum_reader, writers_schema, readers_schema):
+        if writers_schema.type not in ('record', 'error', 'request') or not readers_schema.match(writers_schema):
+            raise avro.errors.UsageError('Lazy reading requires matching record schemas.')
+        compiler = _ReaderCompiler(datum_reader)
+        writers_positions = {field.name: i for i, field in enumerate(writers_schema.fields)}
+        self.names = tuple(field.name for field in readers_schema.fields)
+        self._skippers = tuple(compiler.skipper(field.type) for field in writers_schema.fields)
+        # Maps the name of each reader's field to the position of the writer's field and its reader,
+        # or to None and a function returning its default.
+        self._fields = {}
+        for field in readers_schema.fields:
+            position = writers_positions.get(field.name)
+            if position is not None:
+                self._fields[field.name] = (position, compiler.reader(writers_schema.fields[position].type, field.type))
+            elif field.has_default:
+                read_default = functools.partial(datum_reader._field_default, field)
+                self._fields[field.name] = (None, read_default)
+            else:
+                fail_msg = 'No default value for field %s' % field.name
+                raise avro.errors.SchemaResolutionException(fail_msg, writers_schema, readers_schema)
+
+    def __call__(self, decoder):
+        if not isinstance(decoder, BufferDecoder):
+            raise avro.errors.UsageError('Lazy reading requires a BufferDecoder.')
+        offsets = []
+        for skip in self._skippers:
+            offsets.append(decoder.position)
+            skip(decoder)
+        return LazyRecord(decoder.buffer, offsets, self)
+
+    def read_field(self, name, buffer, offsets):
+        position, read = self._fields[name]
+        if position is None:
+            return read()
+        return read(BufferDecoder(buffer, offsets[position]))
+
+
+#
+# Compiled writer plans
+#
+
+def _encoder_call(method_name, *args):
+    """Return a plan calling the named encoder method on the datum."""
+    def write(datum, encoder):
+        getattr(encoder, method_name)(datum, *args)
+    return write
+
+
+def _validated(writers_schema, write):
+    """Return a plan validating the datum against writers_schema before calling write."""
+    validate_datum = writers_schema.validate
+
+    def write_validated(datum, encoder):
+        if validate_datum(datum) is None:
+            raise avro.errors.AvroTypeException(writers_schema, datum)
+        write(datum, encoder)
+    return write_validated
+
+
+class _WriterCompiler:
+    """Compile a writer's schema into a tree of closures.
+
+    Every node of the resulting plan is a callable taking a datum and an
+    encoder. All dispatch on schema and logical types is done once, when
+    compiling. Records are compiled to generated Python functions that
+    look up and encode each field in turn.
+    """
+
+    _PRIMITIVE_WRITERS = {
+        'null': _encoder_call('write_null'),
+        'boolean': _encoder_call('write_boolean'),
+        'string': _encoder_call('write_utf8'),
+        'int': _encoder_call('write_int'),
+        'long': _encoder_call('write_long'),
+        'float': _encoder_call('write_float'),
+        'double': _encoder_call('write_double'),
+        'bytes': _encoder_call('write_bytes'),
+    }
+
+    _LOGICAL_WRITERS = {
+        ('int', avro.constants.DATE): _encoder_call('write_date_int'),
+        ('int', avro.constants.TIME_MILLIS): _encoder_call('write_time_millis_int'),
+        ('long', avro.constants.TIME_MICROS): _encoder_call('write_time_micros_long'),
+        ('long', avro.constants.TIMESTAMP_MILLIS): _encoder_call('write_timestamp_millis_long'),
+        ('long', avro.constants.TIMESTAMP_MICROS): _encoder_call('write_timestamp_micros_long'),
+    }
+
+    def __init__(self, sized_blocks=False, max_block_count=None, inline_validation=False):
+        """
+        sized_blocks and max_block_count control how arrays and maps are
+        split into blocks, as for DatumWriter. If inline_validation is True,
+        every value is validated against its schema before it is encoded.
+        """
+        self._sized_blocks = sized_blocks
+        self._max_block_count = max_block_count
+        self._inline_validation = inline_validation
+        # Keyed on schema ids; the schemas are kept in the values so the ids stay valid.
+        self._writers = {}
+
+    def writer(self, writers_schema):
+        """Return a plan encoding data according to writers_schema."""
+        key = id(writers_schema)
+        if key not in self._writers:
+            # Placeholder so recursive schemas resolve to the plan under construction.
+            plan = []
+            self._writers[key] = (writers_schema, lambda datum, encoder: plan[0](datum, encoder))
+            plan.append(self._compile_writer(writers_schema))
+            if self._inline_validation and writers_schema.type not in ('union', 'error_union'):
+                plan[0] = _validated(writers_schema, plan[0])
+            self._writers[key] = (writers_schema, plan[0])
+        return self._writers[key][1]
+
+    def _compile_writer(self, writers_schema):
+        type_ = writers_schema.type
+        logical_type = getattr(writers_schema, 'logical_type', None)
+        if (type_, logical_type) in self._LOGICAL_WRITERS:
+            return self._LOGICAL_WRITERS[type_, logical_type]
+        if type_ == 'bytes' and logical_type == avro.constants.DECIMAL:
+            return _encoder_call('write_decimal_bytes', writers_schema.get_prop('scale'))
+        if type_ in self._PRIMITIVE_WRITERS:
+            return self._PRIMITIVE_WRITERS[type_]
+        if type_ == 'fixed':
+            if logical_type == avro.constants.DECIMAL:
+                return _encoder_call('write_decimal_fixed', writers_schema.get_prop('scale'), writers_schema.get_prop('size'))
+            return _encoder_call('write')
+        if type_ == 'enum':
+            return self._compile_enum_writer(writers_schema)
+        if type_ == 'array':
+            return self._compile_array_writer(self.writer(writers_schema.items))
+        if type_ == 'map':
+            return self._compile_map_writer(self.writer(writers_schema.values))
+        if type_ in ('union', 'error_union'):
+            return self._compile_union_writer(writers_schema)
+        if type_ in ('record', 'error', 'request'):
+            return self._compile_record_writer(writers_schema)
+        fail_msg = 'Unknown type: %s' % type_
+        raise avro.errors.AvroException(fail_msg)
+
+    @staticmethod
+    def _compile_enum_writer(writers_schema):
+        index = writers_schema.symbol_index
+
+        def write_enum(datum, encoder):
+            encoder.write_int(index(datum))
+        return write_enum
+
+    def _compile_array_writer(self, write_item):
+        if self._sized_blocks or self._max_block_count:
+            sized_blocks, max_block_count = self._sized_blocks, self._max_block_count
+
+            def write_array_blocks(datum, encoder):
+                _write_blocks(datum, write_item, encoder, sized_blocks, max_block_count)
+            return write_array_blocks
+
+        def write_array(datum, encoder):
+            if len(datum) > 0:
+                encoder.write_long(len(datum))
+                try:
+                    for item in datum:
+                        write_item(item, encoder)
+                except avro.errors.AvroTypeException as e:
+                    e.path.insert(0, _index_of(datum, item))
+                    raise
+            encoder.write_long(0)
+        return write_array
+
+    def _compile_map_writer(self, write_value):
+        if self._sized_blocks or self._max_block_count:
+            sized_blocks, max_block_count = self._sized_blocks, self._max_block_count
+
+            def write_entry(entry, encoder):
+                encoder.write_utf8(entry[0])
+                write_value(entry[1], encoder)
+
+            def write_map_blocks(datum, encoder):
+                _write_blocks(list(datum.items()), write_entry, encoder, sized_blocks, max_block_count, keyed=True)
+            return write_map_blocks
+
+        def write_map(datum, encoder):
+            if len(datum) > 0:
+                encoder.write_long(len(datum))
+                try:
+                    for key, val in datum.items():
+                        encoder.write_utf8(key)
+                        write_value(val, encoder)
+                except avro.errors.AvroTypeException as e:
+                    e.path.insert(0, key)
+                    raise
+            encoder.write_long(0)
+        return write_map
+
+    def _compile_union_writer(self, writers_schema):
+        branches = tuple(self.writer(s) for s in writers_schema.schemas)
+        branch_index = writers_schema.branch_index
+
+        def write_union(datum, encoder):
+            index_of_schema = branch_index(datum)
+            if index_of_schema is None:
+                raise avro.errors.AvroTypeException(writers_schema, datum)
+            encoder.write_long(index_of_schema)
+            branches[index_of_schema](datum, encoder)
+        return write_union
+
+    def _compile_record_writer(self, writers_schema):
+        # field holds the position of the field being written, to report where invalid data is.
+        namespace = {
+            'AvroTypeException': avro.errors.AvroTypeException,
+            'field_getter': _field_getter,
+            'names': tuple(field.name for field in writers_schema.fields),
+        }
+        body = ['    get = datum.get if type(datum) is dict else field_getter(datum)', '    try:']
+        for i, field in enumerate(writers_schema.fields):
+            namespace['write%d' % i] = self.writer(field.type)
+            body.append('        field = %d' % i)
+            body.append('        write%d(get(%r), encoder)' % (i, field.name))
+        body.append('    except AvroTypeException as e:')
+        body.append('        e.path.insert(0, names[field])')
+        body.append('        raise')
+        if not writers_schema.fields:
+            body = ['    pass']
+        source = 'def write_record(datum, encoder):\n%s\n' % '\n'.join(body)
+        exec(compile(source, '<avro record writer %s>' % getattr(writers_schema, 'fullname', None), 'exec'), namespace)
+        return namespace['write_record']
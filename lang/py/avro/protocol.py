@@ -234,12 +234,25 @@ def make_avpr_object(json_data):
     return Protocol(name, namespace, types, messages)
 
 
+@avro.schema.cache_parsed(avro.schema.PARSE_CACHE_SIZE)
 def parse(json_string):
-    """Constructs the Protocol from the JSON text."""
+    """Constructs the Protocol from the JSON text.
+
+    Protocols are cached like schemas: parsing the same JSON text again
+    returns the same Protocol object. Don't modify it. Its types and the
+    schemas of its messages are frozen, see avro.schema.freeze().
+    """
     try:
         json_data = json.loads(json_string)
     except ValueError:
         raise avro.errors.ProtocolParseException('Error parsing JSON: %s' % json_string)
 
     # construct the Avro Protocol object
-    return make_avpr_object(json_data)
+    protocol = make_avpr_object(json_data)
+    for type_ in protocol.types or ():
+        avro.schema.freeze(type_)
+    for message in (protocol.messages or {}).values():
+        avro.schema.freeze(message.request)
+        avro.schema.freeze(message.response)
+        avro.schema.freeze(message.errors)
+    return protocol
@@ -43,10 +43,14 @@ A schema may be one of:
 import abc
 import datetime
 import decimal
+import functools
+import hashlib
 import json
+import keyword
 import math
 import re
 import sys
+import types
 import warnings
 
 import avro.constants
@@ -113,6 +117,40 @@ VALID_FIELD_SORT_ORDERS = (
     'ignore',
 )
 
+# The Python types of the data valid for each type of schema, used to narrow down union branches.
+_PYTHON_TYPES = {
+    'null': (type(None),),
+    'boolean': (bool,),
+    'string': (str,),
+    'bytes': (bytes,),
+    'int': (int,),
+    'long': (int,),
+    'float': (int, float),
+    'double': (int, float),
+    'fixed': (bytes,),
+    'enum': (str,),
+    'array': (list,),
+    'map': (dict,),
+    'record': (dict,),
+    'error': (dict,),
+    'request': (dict,),
+}
+
+# The Python types that are exact matches of the types that also accept wider ones, such as int for double.
+_EXACT_PYTHON_TYPES = {
+    'float': (float,),
+    'double': (float,),
+}
+
+_LOGICAL_PYTHON_TYPES = {
+    avro.constants.DATE: (datetime.date,),
+    avro.constants.DECIMAL: (decimal.Decimal,),
+    avro.constants.TIME_MICROS: (datetime.time,),
+    avro.constants.TIME_MILLIS: (datetime.time,),
+    avro.constants.TIMESTAMP_MICROS: (datetime.datetime,),
+    avro.constants.TIMESTAMP_MILLIS: (datetime.datetime,),
+}
+
 INT_MIN_VALUE = -(1 << 31)
 INT_MAX_VALUE = (1 << 31) - 1
 LONG_MIN_VALUE = -(1 << 63)
@@ -132,13 +170,136 @@ def _is_timezone_aware_datetime(dt):
     return dt.tzinfo is not None and dt.tzinfo.utcoffset(dt) is not None
 
 
+#
+# Fingerprints
+#
+
+CRC_64_AVRO = 'CRC-64-AVRO'
+
+# Fingerprint algorithm names, including the names Java uses for common digests.
+_FINGERPRINT_ALGORITHMS = {name: name for name in hashlib.algorithms_guaranteed}
+_FINGERPRINT_ALGORITHMS.update({'MD5': 'md5', 'SHA-1': 'sha1', 'SHA-256': 'sha256', CRC_64_AVRO: CRC_64_AVRO})
+FINGERPRINT_ALGORITHMS = frozenset(_FINGERPRINT_ALGORITHMS)
+
+_EMPTY64 = 0xc15d213aa4d7a795
+
+
+def _crc64_tables():
+    """Return the eight tables used to compute the CRC-64-AVRO of eight bytes at a time."""
+    table = []
+    for i in range(256):
+        fp = i
+        for _ in range(8):
+            fp = (fp >> 1) ^ (_EMPTY64 & -(fp & 1))
+        table.append(fp)
+    tables = [tuple(table)]
+    for _ in range(7):
+        previous = tables[-1]
+        tables.append(tuple((fp >> 8) ^ table[fp & 0xff] for fp in previous))
+    return tables
+
+
+_CRC64_TABLES = _crc64_tables()
+
+
+def crc64_avro(data):
+    """Return the 64-bit Rabin fingerprint of data, as described in the Avro specification.
+
+    Eight bytes are folded in per step, using a table for each of them.
+    The fingerprint is returned as eight bytes in little-endian order, like
+    the Java implementation does.
+    """
+    t0, t1, t2, t3, t4, t5, t6, t7 = _CRC64_TABLES
+    result = _EMPTY64
+    end = len(data) - len(data) % 8
+    for start in range(0, end, 8):
+        result ^= int.from_bytes(data[start:start + 8], 'little')
+        result = (t7[result & 0xff] ^ t6[(result >> 8) & 0xff] ^ t5[(result >> 16) & 0xff] ^ t4[(result >> 24) & 0xff] ^
+                  t3[(result >> 32) & 0xff] ^ t2[(result >> 40) & 0xff] ^ t1[(result >> 48) & 0xff] ^ t0[result >> 56])
+    for b in data[end:]:
+        result = (result >> 8) ^ t0[(result ^ b) & 0xff]
+    return result.to_bytes(8, 'little')
+
+
+def fingerprint(data, algorithm=CRC_64_AVRO):
+    """Return the fingerprint of the bytes data, computed with the named algorithm.
+
+    @arg algorithm: One of FINGERPRINT_ALGORITHMS, usually CRC_64_AVRO, 'MD5' or 'SHA-256'
+    @return bytes
+    """
+    try:
+        algorithm = _FINGERPRINT_ALGORITHMS[algorithm]
+    except KeyError:
+        raise avro.errors.UsageError('Unknown schema fingerprint algorithm {!r}'.format(algorithm))
+    if algorithm == CRC_64_AVRO:
+        return crc64_avro(data)
+    return hashlib.new(algorithm, data).digest()
+
+
 #
 # Base Classes
 #
 
-class Schema(abc.ABC):
-    """Base class for all Schema classes."""
-    _props = None
+class _Structural:
+    """Equality and hashing on the JSON structure, cached once frozen by freeze()."""
+    __slots__ = ('_frozen', '_cache')
+
+    def __init__(self):
+        self._frozen = False
+        # The values computed once for this object, in a dict only created when the first one is.
+        self._cache = None
+
+    def _computed(self, key, compute):
+        """Return compute(), only calling it the first time for key."""
+        if self._cache is None:
+            self._cache = {}
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = compute()
+            return value
+
+    @property
+    def frozen(self):
+        """True if this is part of a schema frozen by freeze(), whose properties can't be set anymore."""
+        return self._frozen
+
+    def _check_not_frozen(self, key):
+        if self._frozen:
+            fail_msg = 'Cannot set the %s property of a frozen schema.' % key
+            raise avro.errors.AvroException(fail_msg)
+
+    def __str__(self):
+        if not self._frozen:
+            return json.dumps(self.to_json())
+        return self._computed('str', lambda: json.dumps(self.to_json()))
+
+    def _structure(self):
+        if not self._frozen:
+            return json.dumps(self.to_json(), sort_keys=True)
+        return self._computed('structure', lambda: json.dumps(self.to_json(), sort_keys=True))
+
+    def __hash__(self):
+        if not self._frozen:
+            return hash(self._structure())
+        return self._computed('hash', lambda: hash(self._structure()))
+
+    def __eq__(self, that):
+        if self is that:
+            return True
+        if not isinstance(that, _Structural) or isinstance(self, Field) != isinstance(that, Field):
+            return NotImplemented
+        return hash(self) == hash(that) and self._structure() == that._structure()
+
+
+class Schema(_Structural, abc.ABC):
+    """Base class for all Schema classes.
+
+    Schemas keep all their properties, the type included, in a single props
+    dict, and use __slots__ for everything else. The type is also kept in
+    its own slot, as it is read for every datum.
+    """
+    __slots__ = ('_props', 'type')
 
     def __init__(self, type, other_props=None):
         # Ensure valid ctor args
@@ -150,15 +311,16 @@ class Schema(abc.ABC):
             raise avro.errors.SchemaParseException(fail_msg)
 
         # add members
-        if self._props is None:
-            self._props = {}
+        _Structural.__init__(self)
+        self._props = {}
         self.set_prop('type', type)
         self.type = type
         self._props.update(other_props or {})
 
     @property
     def props(self):
-        return self._props
+        """The properties of this schema, read-only once it is frozen."""
+        return types.MappingProxyType(self._props) if self._frozen else self._props
 
     @property
     def other_props(self):
@@ -187,10 +349,26 @@ class Schema(abc.ABC):
         return self._props.get(key)
 
     def set_prop(self, key, value):
+        self._check_not_frozen(key)
         self._props[key] = value
 
-    def __str__(self):
-        return json.dumps(self.to_json())
+    @property
+    def canonical_form(self):
+        """The Parsing Canonical Form of this schema, as defined by the Avro specification, built once."""
+        return self._computed('canonical_form', self._build_canonical_form)
+
+    def _build_canonical_form(self):
+        parts = []
+        _build_canonical_form(self, set(), parts)
+        return ''.join(parts)
+
+    def fingerprint(self, algorithm=CRC_64_AVRO):
+        """Return the fingerprint of the Parsing Canonical Form of this schema, computed once per algorithm.
+
+        @arg algorithm: One of FINGERPRINT_ALGORITHMS, usually CRC_64_AVRO, 'MD5' or 'SHA-256'
+        @return bytes
+        """
+        return self._computed(('fingerprint', algorithm), lambda: fingerprint(self.canonical_form.encode('utf-8'), algorithm))
 
     @abc.abstractmethod
     def to_json(self, names):
@@ -215,10 +393,60 @@ class Schema(abc.ABC):
         raise Exception("Must be implemented by subclasses.")
 
 
+def _build_canonical_form(schema, names, parts):
+    """Append the parts of the Parsing Canonical Form of schema to parts.
+
+    names holds the full names of the named schemas already written, which
+    are referred to by name afterwards.
+    """
+    type_ = schema.type
+    # Error records are normalized to records, as the Java implementation has no separate type for them.
+    if type_ == 'error':
+        type_ = 'record'
+    if type_ in ('union', 'error_union'):
+        parts.append('[')
+        for i, branch in enumerate(schema.schemas):
+            if i:
+                parts.append(',')
+            _build_canonical_form(branch, names, parts)
+        parts.append(']')
+    elif type_ == 'array':
+        parts.append('{"type":"array","items":')
+        _build_canonical_form(schema.items, names, parts)
+        parts.append('}')
+    elif type_ == 'map':
+        parts.append('{"type":"map","values":')
+        _build_canonical_form(schema.values, names, parts)
+        parts.append('}')
+    elif type_ in ('enum', 'fixed', 'record'):
+        name = json.dumps(schema.fullname, ensure_ascii=False)
+        if schema.fullname in names:
+            parts.append(name)
+            return
+        names.add(schema.fullname)
+        parts.append('{"name":%s,"type":"%s"' % (name, type_))
+        if type_ == 'enum':
+            parts.append(',"symbols":%s' % json.dumps(schema.symbols, separators=(',', ':'), ensure_ascii=False))
+        elif type_ == 'fixed':
+            parts.append(',"size":%d' % schema.size)
+        else:
+            parts.append(',"fields":[')
+            for i, field in enumerate(schema.fields):
+                if i:
+                    parts.append(',')
+                parts.append('{"name":%s,"type":' % json.dumps(field.name, ensure_ascii=False))
+                _build_canonical_form(field.type, names, parts)
+                parts.append('}')
+            parts.append(']')
+        parts.append('}')
+    else:
+        # boolean, bytes, double, float, int, long, null, string
+        parts.append('"%s"' % type_)
+
+
 class Name:
     """Class to describe Avro name."""
-
-    _full = None
+    __slots__ = ('_full',)
 
     def __init__(self, name_attr, space_attr, default_space):
         """The fullname is determined in one of the following ways:
@@ -241,6 +469,7 @@ class Name:
         @arg space_attr: namespace value read in schema or None. The empty string may be used as a namespace to indicate the null namespace.
         @arg default_space: the current default space or None.
         """
+        self._full = None
         if name_attr is None:
             return
         if name_attr == "":
@@ -280,6 +509,7 @@ class Name:
 
 class Names:
     """Track name set and default namespace during parsing."""
+    __slots__ = ('names', 'default_namespace')
 
     def __init__(self, default_namespace=None):
         self.names = {}
@@ -336,6 +566,7 @@ class Names:
 
 class NamedSchema(Schema):
     """Named Schemas specified in NAMED_TYPES."""
+    __slots__ = ('_fullname',)
 
     def __init__(self, type, name, namespace=None, names=None, other_props=None):
         # Ensure valid ctor args
@@ -377,6 +608,13 @@ class NamedSchema(Schema):
 
 
 class LogicalSchema:
+    """Mixin of the schemas of logical types.
+
+    It has no slots of its own: the schema classes mixing it in hold the
+    logical_type slot, so that it can be combined with any Schema class.
+    """
+    __slots__ = ()
+
     def __init__(self, logical_type):
         self.logical_type = logical_type
 
@@ -386,6 +624,8 @@ class LogicalSchema:
 
 
 class DecimalLogicalSchema(LogicalSchema):
+    __slots__ = ()
+
     def __init__(self, precision, scale=0, max_precision=0):
         if not isinstance(precision, int) or precision <= 0:
             raise avro.errors.IgnoredLogicalType(
@@ -407,7 +647,9 @@ class DecimalLogicalSchema(LogicalSchema):
         super(DecimalLogicalSchema, self).__init__('decimal')
 
 
-class Field:
+class Field(_Structural):
+    __slots__ = ('_props', 'type', 'name')
+
     def __init__(self, type, name, has_default, default=None,
                  order=None, names=None, doc=None, other_props=None):
         # Ensure valid ctor args
@@ -422,8 +664,8 @@ class Field:
             raise avro.errors.SchemaParseException(fail_msg)
 
         # add members
+        _Structural.__init__(self)
         self._props = {}
-        self._has_default = has_default
         self._props.update(other_props or {})
 
         if (isinstance(type, str) and names is not None and
@@ -449,10 +691,10 @@ class Field:
 
     # read-only properties
     default = property(lambda self: self.get_prop('default'))
-    has_default = property(lambda self: self._has_default)
+    has_default = property(lambda self: 'default' in self._props)
     order = property(lambda self: self.get_prop('order'))
     doc = property(lambda self: self.get_prop('doc'))
-    props = property(lambda self: self._props)
+    props = property(lambda self: types.MappingProxyType(self._props) if self._frozen else self._props)
 
     # Read-only property dict. Non-reserved properties
     other_props = property(lambda self: get_other_props(self._props, FIELD_RESERVED_PROPS),
@@ -463,11 +705,9 @@ class Field:
         return self._props.get(key)
 
     def set_prop(self, key, value):
+        self._check_not_frozen(key)
         self._props[key] = value
 
-    def __str__(self):
-        return json.dumps(self.to_json())
-
     def to_json(self, names=None):
         if names is None:
             names = Names()
@@ -475,10 +715,6 @@ class Field:
         to_dump['type'] = self.type.to_json(names)
         return to_dump
 
-    def __eq__(self, that):
-        to_cmp = json.loads(str(self))
-        return to_cmp == json.loads(str(that))
-
 #
 # Primitive Types
 #
@@ -486,6 +722,7 @@ class Field:
 
 class PrimitiveSchema(Schema):
     """Valid primitive types are in PRIMITIVE_TYPES."""
+    __slots__ = ()
 
     _validators = {
         'null': lambda x: x is None,
@@ -506,7 +743,7 @@ class PrimitiveSchema(Schema):
         # Call parent ctor
         Schema.__init__(self, type, other_props=other_props)
 
-        self.fullname = type
+    fullname = property(lambda self: self.type)
 
     def match(self, writer):
         """Return True if the current schema (as reader) matches the writer schema.
@@ -524,7 +761,7 @@ class PrimitiveSchema(Schema):
         if len(self.props) == 1:
             return self.fullname
         else:
-            return self.props
+            return self.props.copy()
 
     def validate(self, datum):
         """Return self if datum is a valid representation of this type of primitive schema, else None
@@ -535,15 +772,14 @@ class PrimitiveSchema(Schema):
         validator = self._validators.get(self.type, lambda x: False)
         return self if validator(datum) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 #
 # Decimal Bytes Type
 #
 
 
 class BytesDecimalSchema(PrimitiveSchema, DecimalLogicalSchema):
+    __slots__ = ('logical_type',)
+
     def __init__(self, precision, scale=0, other_props=None):
         DecimalLogicalSchema.__init__(self, precision, scale, max_precision=((1 << 31) - 1))
         PrimitiveSchema.__init__(self, 'bytes', other_props)
@@ -555,20 +791,19 @@ class BytesDecimalSchema(PrimitiveSchema, DecimalLogicalSchema):
     scale = property(lambda self: self.get_prop('scale'))
 
     def to_json(self, names=None):
-        return self.props
+        return self.props.copy()
 
     def validate(self, datum):
         """Return self if datum is a Decimal object, else None."""
         return self if isinstance(datum, decimal.Decimal) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 
 #
 # Complex Types (non-recursive)
 #
 class FixedSchema(NamedSchema):
+    __slots__ = ()
+
     def __init__(self, name, namespace, size, names=None, other_props=None):
         # Ensure valid ctor args
         if not isinstance(size, int) or size < 0:
@@ -599,21 +834,20 @@ class FixedSchema(NamedSchema):
             return self.name_ref(names)
         else:
             names.names[self.fullname] = self
-            return names.prune_namespace(self.props)
+            return names.prune_namespace(self.props.copy())
 
     def validate(self, datum):
         """Return self if datum is a valid representation of this schema, else None."""
         return self if isinstance(datum, bytes) and len(datum) == self.size else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 #
 # Decimal Fixed Type
 #
 
 
 class FixedDecimalSchema(FixedSchema, DecimalLogicalSchema):
+    __slots__ = ('logical_type',)
+
     def __init__(self, size, name, precision, scale=0, namespace=None, names=None, other_props=None):
         max_precision = int(math.floor(math.log10(2) * (8 * size - 1)))
         DecimalLogicalSchema.__init__(self, precision, scale, max_precision)
@@ -626,17 +860,16 @@ class FixedDecimalSchema(FixedSchema, DecimalLogicalSchema):
     scale = property(lambda self: self.get_prop('scale'))
 
     def to_json(self, names=None):
-        return self.props
+        return self.props.copy()
 
     def validate(self, datum):
         """Return self if datum is a Decimal object, else None."""
         return self if isinstance(datum, decimal.Decimal) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 
 class EnumSchema(NamedSchema):
+    __slots__ = ('_symbol_indexes', '_reader_symbols')
+
     def __init__(self, name, namespace, symbols, names=None, doc=None, other_props=None, validate_enum_symbols=True):
         """
         @arg validate_enum_symbols: If False, will allow enum symbols that are not valid Avro names.
@@ -659,10 +892,51 @@ class EnumSchema(NamedSchema):
         self.set_prop('symbols', symbols)
         if doc is not None:
             self.set_prop('doc', doc)
+        default = self.get_prop('default')
+        if default is not None and default not in symbols:
+            fail_msg = 'Enum default %s is not one of its symbols: %s' % (default, symbols)
+            raise avro.errors.AvroException(fail_msg)
+
+        # Both built on first use, see _indexes and reader_symbols.
+        self._symbol_indexes = None
+        # Keyed on the symbols of the writer schemas, which are all the tables depend on.
+        self._reader_symbols = None
 
     # read-only properties
     symbols = property(lambda self: self.get_prop('symbols'))
     doc = property(lambda self: self.get_prop('doc'))
+    default = property(lambda self: self.get_prop('default'))
+
+    def _indexes(self):
+        """Return the zero-based positions of the symbols of this enum, keyed on the symbols."""
+        if self._symbol_indexes is None:
+            self._symbol_indexes = {symbol: i for i, symbol in enumerate(self.symbols)}
+        return self._symbol_indexes
+
+    def symbol_index(self, symbol):
+        """Return the zero-based position of symbol in this enum, raising KeyError if it is not one of its symbols."""
+        return self._indexes()[symbol]
+
+    def reader_symbols(self, writer):
+        """Return the symbols read with this schema as reader, indexed by the positions of writer's symbols.
+
+        Writer symbols that are not symbols of this schema resolve to its
+        default, or to None if it has no default.
+
+        @arg writer: the enum schema the data was written with
+        @return tuple
+        """
+        if self._reader_symbols is None:
+            self._reader_symbols = {}
+        writers_symbols = tuple(writer.symbols)
+        try:
+            return self._reader_symbols[writers_symbols]
+        except KeyError:
+            default = self.default
+            symbol_indexes = self._indexes()
+            table = self._reader_symbols[writers_symbols] = tuple(
+                symbol if symbol in symbol_indexes else default for symbol in writers_symbols)
+            return table
 
     def match(self, writer):
         """Return True if the current schema (as reader) matches the writer schema.
@@ -679,14 +953,13 @@ class EnumSchema(NamedSchema):
             return self.name_ref(names)
         else:
             names.names[self.fullname] = self
-            return names.prune_namespace(self.props)
+            to_dump = names.prune_namespace(self.props.copy())
+            to_dump['symbols'] = list(self.symbols)
+            return to_dump
 
     def validate(self, datum):
         """Return self if datum is a valid member of this Enum, else None."""
-        return self if datum in self.symbols else None
-
-    def __eq__(self, that):
-        return self.props == that.props
+        return self if isinstance(datum, str) and datum in self._indexes() else None
 
 #
 # Complex Types (recursive)
@@ -694,6 +967,8 @@ class EnumSchema(NamedSchema):
 
 
 class ArraySchema(Schema):
+    __slots__ = ()
+
     def __init__(self, items, names=None, other_props=None):
         # Call parent ctor
         Schema.__init__(self, 'array', other_props)
@@ -733,12 +1008,10 @@ class ArraySchema(Schema):
         """Return self if datum is a valid representation of this schema, else None."""
         return self if isinstance(datum, list) else None
 
-    def __eq__(self, that):
-        to_cmp = json.loads(str(self))
-        return to_cmp == json.loads(str(that))
-
 
 class MapSchema(Schema):
+    __slots__ = ()
+
     def __init__(self, values, names=None, other_props=None):
         # Call parent ctor
         Schema.__init__(self, 'map', other_props)
@@ -778,15 +1051,12 @@ class MapSchema(Schema):
         """Return self if datum is a valid representation of this schema, else None."""
         return self if isinstance(datum, dict) and all(isinstance(key, str) for key in datum) else None
 
-    def __eq__(self, that):
-        to_cmp = json.loads(str(self))
-        return to_cmp == json.loads(str(that))
-
 
 class UnionSchema(Schema):
     """
     names is a dictionary of schema objects
     """
+    __slots__ = ('_schemas', '_candidates')
 
     def __init__(self, schemas, names=None):
         # Ensure valid ctor args
@@ -816,10 +1086,60 @@ class UnionSchema(Schema):
             else:
                 schema_objects.append(new_schema)
         self._schemas = schema_objects
+        # Maps the type of a datum to the indexes of the branches it may be an example of, best first.
+        # Created on first use.
+        self._candidates = None
 
     # read-only properties
     schemas = property(lambda self: self._schemas)
 
+    def _candidate_indexes(self, datum):
+        """Return the indexes of the branches datum may be an example of.
+
+        Branches of which the type of datum is an exact Python type come
+        first, such as boolean for True or long for 5, then the branches
+        accepting it as a subclass or a wider type, such as long for True or
+        double for 5, each in the order of the union.
+        """
+        datum_type = type(datum)
+        if self._candidates is None:
+            self._candidates = {}
+        try:
+            return self._candidates[datum_type]
+        except KeyError:
+            exact = []
+            wider = []
+            for i, branch in enumerate(self.schemas):
+                python_types = (_LOGICAL_PYTHON_TYPES.get(getattr(branch, 'logical_type', None)) or
+                                _PYTHON_TYPES.get(branch.type, object))
+                if not issubclass(datum_type, python_types):
+                    continue
+                if datum_type in _EXACT_PYTHON_TYPES.get(branch.type, python_types):
+                    exact.append(i)
+                else:
+                    wider.append(i)
+            candidates = self._candidates[datum_type] = tuple(exact + wider)
+            return candidates
+
+    def branch_index(self, datum):
+        """Return the index of the best branch of which datum is an example, else None.
+
+        Branches are narrowed down by the type of datum first, so only when
+        more than one branch accepts that type is datum validated against
+        them, exact matches of its type first (see _candidate_indexes). A datum of a type accepted by a single branch is not
+        validated at all: this is meant for data that was validated already.
+
+        @arg datum: The data to find the branch for
+        @return Optional[int]
+        """
+        candidates = self._candidate_indexes(datum)
+        if len(candidates) == 1:
+            return candidates[0]
+        for i in candidates:
+            if self.schemas[i].validate(datum) is not None:
+                return i
+        return None
+
     def match(self, writer):
         """Return True if the current schema (as reader) matches the writer schema.
 
@@ -838,16 +1158,15 @@ class UnionSchema(Schema):
 
     def validate(self, datum):
         """Return the first branch schema of which datum is a valid example, else None."""
-        for branch in self.schemas:
+        for i in self._candidate_indexes(datum):
+            branch = self.schemas[i]
             if branch.validate(datum) is not None:
                 return branch
 
-    def __eq__(self, that):
-        to_cmp = json.loads(str(self))
-        return to_cmp == json.loads(str(that))
-
 
 class ErrorUnionSchema(UnionSchema):
+    __slots__ = ()
+
     def __init__(self, schemas, names=None):
         # Prepend "string" to handle system errors
         UnionSchema.__init__(self, ['string'] + schemas, names)
@@ -865,6 +1184,8 @@ class ErrorUnionSchema(UnionSchema):
 
 
 class RecordSchema(NamedSchema):
+    __slots__ = ('_record_class', '_fields_dict')
+
     @staticmethod
     def make_field_objects(field_data, names):
         """We're going to need to make message parameters too."""
@@ -936,16 +1257,19 @@ class RecordSchema(NamedSchema):
         if schema_type == 'record':
             names.default_namespace = old_default
 
+        self._record_class = None
+        self._fields_dict = None
+
     # read-only properties
     fields = property(lambda self: self.get_prop('fields'))
     doc = property(lambda self: self.get_prop('doc'))
 
     @property
     def fields_dict(self):
-        fields_dict = {}
-        for field in self.fields:
-            fields_dict[field.name] = field
-        return fields_dict
+        """The fields of this record keyed on their names, built once. Don't modify it."""
+        if self._fields_dict is None:
+            self._fields_dict = {field.name: field for field in self.fields}
+        return self._fields_dict
 
     def to_json(self, names=None):
         if names is None:
@@ -963,13 +1287,90 @@ class RecordSchema(NamedSchema):
         to_dump['fields'] = [f.to_json(names) for f in self.fields]
         return to_dump
 
+    def project(self, field_paths):
+        """Return a reader's schema for this record keeping only some of its fields.
+
+        @arg field_paths: Dotted paths of the fields to keep, like "a" or "a.b".
+            A path can continue into a record, through arrays, maps and unions,
+            to keep only some of its fields. Fields not named are left out.
+        @return RecordSchema: A frozen schema, see freeze()
+        """
+        tree = {}
+        for path in field_paths:
+            node = tree
+            parts = path.split('.')
+            for part in parts[:-1]:
+                child = node.setdefault(part, {})
+                if child is None:
+                    break
+                node = child
+            else:
+                node[parts[-1]] = None
+        trees = {}
+        _collect_projection_trees(self, tree, trees)
+        return freeze(make_avsc_object(_project_json(self, trees[self.fullname], Names(), trees)))
+
+    def record_class(self):
+        """Return a class holding the data of this record in slots, one per field.
+
+        The class is generated the first time this is called. Its instances
+        are built from the values of the fields, in order, as positional or
+        keyword arguments, and use much less memory than dicts. Pass this
+        method as the record_factory of a DatumReader to read records as
+        instances of these classes. DatumWriter accepts them like dicts.
+
+        @return type: A subclass of Record
+        """
+        if self._record_class is None:
+            self._record_class = _make_record_class(self)
+        return self._record_class
+
     def validate(self, datum):
         """Return self if datum is a valid representation of this schema, else None"""
+        if isinstance(datum, Record):
+            return self if {f.name for f in self.fields}.issuperset(datum.__slots__) else None
         return self if isinstance(datum, dict) and {f.name for f in self.fields}.issuperset(datum.keys()) else None
 
+
+class Record:
+    """The base class of the classes generated by RecordSchema.record_class.
+
+    The names of the fields of a record are the __slots__ of its class.
+    """
+    __slots__ = ()
+
     def __eq__(self, that):
-        to_cmp = json.loads(str(self))
-        return to_cmp == json.loads(str(that))
+        return type(self) is type(that) and all(getattr(self, name) == getattr(that, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join('%s=%r' % (name, getattr(self, name)) for name in self.__slots__))
+
+
+_PYTHON_TYPES['record'] = _PYTHON_TYPES['error'] = _PYTHON_TYPES['request'] = (dict, Record)
+
+
+def _make_record_class(record_schema):
+    """Generate the Record subclass for record_schema, with an __init__ setting each slot."""
+    names = tuple(field.name for field in record_schema.fields)
+    for name in names:
+        # Slots must be identifiers, and Python mangles the ones starting with two underscores.
+        if not name.isidentifier() or name.startswith('__'):
+            fail_msg = 'Cannot make a record class for %s with a field named %r' % (
+                getattr(record_schema, 'fullname', None), name)
+            raise avro.errors.SchemaParseException(fail_msg)
+    # Fields named like Python keywords can't be parameters: fall back to positional names.
+    if any(keyword.iskeyword(name) for name in names):
+        params = tuple('_%d' % i for i in range(len(names)))
+    else:
+        params = names
+    # The instance is named so that it can't be a field name, leaving self free for one.
+    body = ['    setattr(__record, %r, %s)' % (name, param) if keyword.iskeyword(name) else '    __record.%s = %s' % (name, param)
+            for name, param in zip(names, params)]
+    source = 'def __init__(__record%s):\n%s\n' % (''.join(', ' + param for param in params), '\n'.join(body or ['    pass']))
+    namespace = {}
+    exec(compile(source, '<avro record class %s>' % getattr(record_schema, 'fullname', None), 'exec'), namespace)
+    class_name = getattr(record_schema, 'name', None) or 'Request'
+    return type(class_name, (Record,), {'__slots__': names, '__init__': namespace['__init__'], '__module__': __name__})
 
 
 #
@@ -977,98 +1378,93 @@ class RecordSchema(NamedSchema):
 #
 
 class DateSchema(LogicalSchema, PrimitiveSchema):
+    __slots__ = ('logical_type',)
+
     def __init__(self, other_props=None):
         LogicalSchema.__init__(self, avro.constants.DATE)
         PrimitiveSchema.__init__(self, 'int', other_props)
 
     def to_json(self, names=None):
-        return self.props
+        return self.props.copy()
 
     def validate(self, datum):
         """Return self if datum is a valid date object, else None."""
         return self if isinstance(datum, datetime.date) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 #
 # time-millis Type
 #
 
 
 class TimeMillisSchema(LogicalSchema, PrimitiveSchema):
+    __slots__ = ('logical_type',)
+
     def __init__(self, other_props=None):
         LogicalSchema.__init__(self, avro.constants.TIME_MILLIS)
         PrimitiveSchema.__init__(self, 'int', other_props)
 
     def to_json(self, names=None):
-        return self.props
+        return self.props.copy()
 
     def validate(self, datum):
         """Return self if datum is a valid representation of this schema, else None."""
         return self if isinstance(datum, datetime.time) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 #
 # time-micros Type
 #
 
 
 class TimeMicrosSchema(LogicalSchema, PrimitiveSchema):
+    __slots__ = ('logical_type',)
+
     def __init__(self, other_props=None):
         LogicalSchema.__init__(self, avro.constants.TIME_MICROS)
         PrimitiveSchema.__init__(self, 'long', other_props)
 
     def to_json(self, names=None):
-        return self.props
+        return self.props.copy()
 
     def validate(self, datum):
         """Return self if datum is a valid representation of this schema, else None."""
         return self if isinstance(datum, datetime.time) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 #
 # timestamp-millis Type
 #
 
 
 class TimestampMillisSchema(LogicalSchema, PrimitiveSchema):
+    __slots__ = ('logical_type',)
+
     def __init__(self, other_props=None):
         LogicalSchema.__init__(self, avro.constants.TIMESTAMP_MILLIS)
         PrimitiveSchema.__init__(self, 'long', other_props)
 
     def to_json(self, names=None):
-        return self.props
+        return self.props.copy()
 
     def validate(self, datum):
         return self if isinstance(datum, datetime.datetime) and _is_timezone_aware_datetime(datum) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 #
 # timestamp-micros Type
 #
 
 
 class TimestampMicrosSchema(LogicalSchema, PrimitiveSchema):
+    __slots__ = ('logical_type',)
+
     def __init__(self, other_props=None):
         LogicalSchema.__init__(self, avro.constants.TIMESTAMP_MICROS)
         PrimitiveSchema.__init__(self, 'long', other_props)
 
     def to_json(self, names=None):
-        return self.props
+        return self.props.copy()
 
     def validate(self, datum):
         return self if isinstance(datum, datetime.datetime) and _is_timezone_aware_datetime(datum) else None
 
-    def __eq__(self, that):
-        return self.props == that.props
-
 #
 # Module Methods
 #
@@ -1083,6 +1479,93 @@ def get_other_props(all_props, reserved_props):
         return {k: v for k, v in all_props.items() if k not in reserved_props}
 
 
+def _is_projectable(schema):
+    return schema.type in ('record', 'error', 'array', 'map')
+
+
+def _merge_projection_trees(tree, other):
+    """Return the tree keeping the fields kept by either tree, None standing for all of them."""
+    if tree is None or other is None:
+        return None
+    merged = dict(tree)
+    for name, subtree in other.items():
+        merged[name] = _merge_projection_trees(merged[name], subtree) if name in merged else subtree
+    return merged
+
+
+def _collect_projection_trees(schema, tree, trees):
+    """Merge the trees of the fields to keep of every record reached from schema into trees, by fullname.
+
+    All the references to a named record share its definition, so it must
+    keep the fields kept through any of them.
+    """
+    if schema.type in ('record', 'error'):
+        if schema.fullname in trees:
+            merged = _merge_projection_trees(trees[schema.fullname], tree)
+            if merged == trees[schema.fullname]:
+                return
+            trees[schema.fullname] = merged
+        else:
+            trees[schema.fullname] = tree
+        if tree is not None:
+            unknown = set(tree).difference(f.name for f in schema.fields)
+            if unknown:
+                fail_msg = 'Cannot project unknown fields %s of %s' % (sorted(unknown), schema.fullname)
+                raise avro.errors.AvroException(fail_msg)
+        for field in schema.fields:
+            if tree is None or field.name in tree:
+                _collect_projection_trees(field.type, None if tree is None else tree[field.name], trees)
+    elif schema.type == 'array':
+        _collect_projection_trees(schema.items, tree, trees)
+    elif schema.type == 'map':
+        _collect_projection_trees(schema.values, tree, trees)
+    elif schema.type == 'union':
+        if tree is not None and not any(_is_projectable(s) for s in schema.schemas):
+            fail_msg = 'Cannot project fields %s of a union without records' % sorted(tree)
+            raise avro.errors.AvroException(fail_msg)
+        for s in schema.schemas:
+            _collect_projection_trees(s, tree if _is_projectable(s) else None, trees)
+    elif tree is not None:
+        fail_msg = 'Cannot project fields %s of a %s schema' % (sorted(tree), schema.type)
+        raise avro.errors.AvroException(fail_msg)
+
+
+def _project_json(schema, tree, names, trees):
+    """Return the JSON of schema keeping only the fields in tree.
+
+    tree maps field names to the tree of their own fields to keep, or to None to keep them whole.
+    Records keep the fields of their merged tree in trees instead, see _collect_projection_trees.
+    """
+    if schema.type in ('record', 'error'):
+        tree = trees[schema.fullname]
+    if tree is None:
+        return schema.to_json(names)
+    if schema.type in ('record', 'error'):
+        if schema.fullname in names.names:
+            return schema.name_ref(names)
+        names.names[schema.fullname] = schema
+        to_dump = names.prune_namespace(schema.props.copy())
+        to_dump['fields'] = []
+        for field in schema.fields:
+            if field.name in tree:
+                field_json = field.props.copy()
+                field_json['type'] = _project_json(field.type, tree[field.name], names, trees)
+                to_dump['fields'].append(field_json)
+        return to_dump
+    if schema.type == 'array':
+        to_dump = schema.props.copy()
+        to_dump['items'] = _project_json(schema.items, tree, names, trees)
+        return to_dump
+    if schema.type == 'map':
+        to_dump = schema.props.copy()
+        to_dump['values'] = _project_json(schema.values, tree, names, trees)
+        return to_dump
+    if schema.type == 'union':
+        return [_project_json(s, tree if _is_projectable(s) else None, names, trees) for s in schema.schemas]
+    fail_msg = 'Cannot project fields %s of a %s schema' % (sorted(tree), schema.type)
+    raise avro.errors.AvroException(fail_msg)
+
+
 def make_bytes_decimal_schema(other_props):
     """Make a BytesDecimalSchema from just other_props."""
     return BytesDecimalSchema(other_props.get('precision'), other_props.get('scale', 0))
@@ -1191,9 +1674,73 @@ def make_avsc_object(json_data, names=None, validate_enum_symbols=True):
 # TODO(hammer): make method for reading from a file?
 
 
+def freeze(schema):
+    """Freeze schema and all the schemas and fields it is made of, and return it.
+
+    Properties of frozen schemas can't be set anymore, so their string and
+    hash are computed once and kept. Their to_json() is still a new object
+    every time, free to be modified by the caller.
+
+    @arg schema: The Schema to freeze
+    @return Schema: The same schema
+    """
+    pending = [schema]
+    while pending:
+        current = pending.pop()
+        if current._frozen:
+            continue
+        current._frozen = True
+        if isinstance(current, UnionSchema):
+            pending.extend(current.schemas)
+        elif isinstance(current, ArraySchema):
+            pending.append(current.items)
+        elif isinstance(current, MapSchema):
+            pending.append(current.values)
+        elif isinstance(current, RecordSchema):
+            for field in current.fields:
+                field._frozen = True
+                pending.append(field.type)
+    return schema
+
+
+def cache_parsed(maxsize):
+    """Decorate a parse function to return the same object when called with the same arguments again.
+
+    At most maxsize results are kept, least recently used first out.
+    Warnings emitted while parsing are recorded and emitted again every
+    time the cached result is returned.
+    """
+    def decorator(parse_function):
+        @functools.lru_cache(maxsize=maxsize)
+        def parse_recording_warnings(*args, **kwargs):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                parsed = parse_function(*args, **kwargs)
+            return parsed, tuple(warning.message for warning in caught)
+
+        @functools.wraps(parse_function)
+        def parse(*args, **kwargs):
+            parsed, caught = parse_recording_warnings(*args, **kwargs)
+            for warning in caught:
+                warnings.warn(warning)
+            return parsed
+        parse.cache_clear = parse_recording_warnings.cache_clear
+        parse.cache_info = parse_recording_warnings.cache_info
+        return parse
+    return decorator
+
+
+# The number of schemas parse() keeps, keyed on their JSON text.
+PARSE_CACHE_SIZE = 256
+
+
+@cache_parsed(PARSE_CACHE_SIZE)
 def parse(json_string, validate_enum_symbols=True):
     """Constructs the Schema from the JSON text.
 
+    Schemas are cached: parsing the same JSON text again returns the same
+    Schema object, which is shared by all the callers. It is frozen, see freeze().
+
     @arg json_string: The json string of the schema to parse
     @arg validate_enum_symbols: If False, will allow enum symbols that are not valid Avro names.
     @return Schema
@@ -1211,4 +1758,4 @@ def parse(json_string, validate_enum_symbols=True):
     names = Names()
 
     # construct the Avro Schema object
-    return make_avsc_object(json_data, names, validate_enum_symbols)
+    return freeze(make_avsc_object(json_data, names, validate_enum_symbols))
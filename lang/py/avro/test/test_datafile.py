@@ -20,6 +20,7 @@
 # limitations under the License.
 
 import contextlib
+import datetime
 import itertools
 import os
 import tempfile
@@ -29,6 +30,7 @@ import avro.codecs
 import avro.datafile
 import avro.io
 import avro.schema
+import avro.timezones
 
 CODECS_TO_VALIDATE = avro.codecs.supported_codec_names()
 TEST_PAIRS = tuple((avro.schema.parse(schema), datum) for schema, datum in (
@@ -117,6 +119,16 @@ class TestDataFile(unittest.TestCase):
                 self.assertEqual(len(data), 10)
                 self.assertEqual(data, [datum] * 10)
 
+    def test_buffer_writer(self):
+        '''The deprecated buffer_writer holds a copy of the block being written.'''
+        schema, datum = TEST_PAIRS[0]
+        with writer(self.tempfile(), schema) as dfw:
+            dfw.append(datum)
+            with self.assertWarns(UserWarning):
+                buffer_writer = dfw.buffer_writer
+            self.assertEqual(dfw.buffer_encoder.getvalue(), buffer_writer.getvalue())
+            self.assertEqual(len(dfw.buffer_encoder), buffer_writer.tell())
+
     def test_round_trip(self):
         '''A datafile can be written to and read from.'''
         for codec in CODECS_TO_VALIDATE:
@@ -134,6 +146,274 @@ class TestDataFile(unittest.TestCase):
                 self.assertEqual(len(data), 10)
                 self.assertEqual(data, [datum] * 10)
 
+    def test_round_trip_compiled(self):
+        """A datafile can be written to and read from with compiled plans."""
+        for codec in CODECS_TO_VALIDATE:
+            for schema, datum in TEST_PAIRS:
+                path = self.tempfile()
+                with avro.datafile.DataFileWriter(open(path, 'wb'), avro.io.DatumWriter(compiled=True), schema, codec) as dfw:
+                    for _ in range(10):
+                        dfw.append(datum)
+
+                with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(compiled=True)) as dfr:
+                    data = list(dfr)
+                self.assertEqual(data, [datum] * 10)
+
+    def test_compression_workers(self):
+        """A datafile can be written with its blocks compressed by a pool of threads, in order."""
+        schema = avro.schema.parse('{"type": "record", "name": "Test", "fields": [{"name": "f", "type": "string"}]}')
+        # about 64 records per block
+        records = [{'f': str(i) * (1000 // len(str(i)))} for i in range(1000)]
+        for codec in CODECS_TO_VALIDATE:
+            path = self.tempfile()
+            with avro.datafile.DataFileWriter(open(path, 'wb'), avro.io.DatumWriter(), schema, codec,
+                                              compression_workers=2) as dfw:
+                for i, record in enumerate(records[:-1]):
+                    dfw.append(record)
+                    if i == 500:
+                        dfw.sync()
+            with reader(path) as dfr:
+                self.assertEqual(records[:-1], list(dfr))
+
+            # appending to it, too
+            with avro.datafile.DataFileWriter(open(path, 'ab+'), avro.io.DatumWriter(), compression_workers=1) as dfw:
+                dfw.append(records[-1])
+            with reader(path) as dfr:
+                self.assertEqual(records, list(dfr))
+
+    def test_seek_and_splits(self):
+        """A datafile can be read from its sync points, and split into byte ranges read separately."""
+        schema = avro.schema.parse('{"type": "record", "name": "Test", "fields": [{"name": "f", "type": "long"}]}')
+        records = [{'f': i} for i in range(100)]
+        path = self.tempfile()
+        sync_points = {}
+        with writer(path, schema, 'deflate') as dfw:
+            for record in records:
+                dfw.append(record)
+                if record['f'] % 10 == 9:
+                    sync_points[record['f'] + 1] = dfw.sync()
+
+        with reader(path) as dfr:
+            first_block = dfr.tell()
+            self.assertEqual(records[:3], [next(dfr) for _ in range(3)])
+            self.assertEqual(first_block, dfr.tell())
+            dfr.seek(sync_points[50])
+            self.assertEqual(records[50:52], [next(dfr) for _ in range(2)])
+            self.assertEqual(sync_points[50], dfr.tell())
+            self.assertEqual(records[52:60], [next(dfr) for _ in range(8)])
+            self.assertEqual(sync_points[60], dfr.tell())
+            self.assertTrue(dfr.past_sync(sync_points[60] - avro.datafile.SYNC_SIZE))
+            self.assertFalse(dfr.past_sync(sync_points[60] - avro.datafile.SYNC_SIZE + 1))
+            dfr.sync(sync_points[30] - avro.datafile.SYNC_SIZE)
+            self.assertEqual(records[30], next(dfr))
+            dfr.sync(sync_points[30] - avro.datafile.SYNC_SIZE + 1)
+            self.assertEqual(records[40], next(dfr))
+            dfr.sync(0)
+            self.assertEqual(records, list(dfr))
+            self.assertTrue(dfr.past_sync(0))
+
+        file_length = os.path.getsize(path)
+        for split_length in (1, 97, 1000, file_length):
+            data = []
+            for start in range(0, file_length, split_length):
+                with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(),
+                                                  start=start, length=split_length) as dfr:
+                    data.extend(dfr)
+            self.assertEqual(records, data)
+
+    def test_block_index(self):
+        """A sidecar index of the blocks of a datafile gives access to any record by its number."""
+        schema = avro.schema.parse('{"type": "record", "name": "Test", "fields": [{"name": "f", "type": "long"}]}')
+        records = [{'f': i} for i in range(100)]
+        for codec in CODECS_TO_VALIDATE:
+            path = self.tempfile()
+            with writer(path, schema, codec) as dfw:
+                for record in records:
+                    dfw.append(record)
+                    if record['f'] % 13 == 12:
+                        dfw.sync()
+                        dfw.sync()
+
+            index_path = self.tempfile()
+            with reader(path) as dfr:
+                with open(index_path, 'wb') as index_file:
+                    dfr.block_index().write(index_file)
+                self.assertEqual(records, list(dfr))
+            with open(index_path, 'rb') as index_file:
+                index = avro.datafile.BlockIndex.read(index_file)
+            self.assertEqual(100, len(index))
+            self.assertEqual([13] * 7 + [9], [count for offset, first, count in index.blocks])
+            self.assertEqual((index.blocks[2][0], 26, 13), index.find(38))
+
+            with reader(path) as dfr:
+                for record_number in (99, 0, 38, 39, 12, 13):
+                    dfr.seek_record(record_number, index)
+                    self.assertEqual(records[record_number], next(dfr))
+                self.assertEqual(records[14:], list(dfr))
+                self.assertRaises(IndexError, dfr.seek_record, 100, index)
+                self.assertRaises(avro.errors.DataFileException, dfr.seek_record, 0,
+                                  avro.datafile.BlockIndex(bytes(16), index.blocks))
+
+    def test_mmap(self):
+        """A datafile can be read from a memory mapping of its file, with blocks decoded in place."""
+        schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event",
+           "fields": [{"name": "id", "type": "long"}, {"name": "name", "type": "string"}]}""")
+        records = [{'id': i, 'name': str(i)} for i in range(100)]
+        for codec in CODECS_TO_VALIDATE:
+            path = self.tempfile()
+            sync_points = []
+            with writer(path, schema, codec) as dfw:
+                for record in records:
+                    dfw.append(record)
+                    if record['id'] % 10 == 9:
+                        sync_points.append(dfw.sync())
+
+            with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(), use_mmap=True) as dfr:
+                self.assertEqual(records[:5], [next(dfr) for _ in range(5)])
+                if codec == avro.datafile.NULL_CODEC:
+                    self.assertIs(dfr.datum_decoder.buffer.obj, dfr.raw_decoder.buffer.obj)
+                dfr.seek(sync_points[4])
+                self.assertEqual(records[50:], list(dfr))
+                index = dfr.block_index()
+                dfr.seek_record(42, index)
+                self.assertEqual(records[42], next(dfr))
+            with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(compiled=True), use_mmap=True,
+                                              start=sync_points[2], length=sync_points[5] - sync_points[2]) as dfr:
+                self.assertEqual(records[40:70], list(dfr))
+            with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(lazy=True), use_mmap=True) as dfr:
+                lazy_records = list(dfr)
+            self.assertEqual(records, lazy_records)
+
+    def test_projection(self):
+        """A datafile can be read with only some of its fields."""
+        schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event",
+           "fields": [{"name": "id", "type": "long"},
+                      {"name": "samples", "type": {"type": "array", "items": "double"}},
+                      {"name": "tags", "type": {"type": "map", "values": "string"}},
+                      {"name": "user", "type": {"type": "record", "name": "User",
+                                                "fields": [{"name": "name", "type": "string"},
+                                                           {"name": "age", "type": "int"}]}}]}""")
+        records = [{'id': i, 'samples': [0.5] * i, 'tags': {'k': str(i)}, 'user': {'name': 'u', 'age': i}}
+                   for i in range(10)]
+        path = self.tempfile()
+        with writer(path, schema) as dfw:
+            for record in records:
+                dfw.append(record)
+
+        for compiled in (False, True):
+            datum_reader = avro.io.DatumReader(compiled=compiled)
+            with avro.datafile.DataFileReader(open(path, 'rb'), datum_reader, fields=['user.age', 'id']) as dfr:
+                self.assertEqual([{'id': i, 'user': {'age': i}} for i in range(10)], list(dfr))
+            # The datum reader passed in is left reading every field.
+            self.assertIsNone(datum_reader.readers_schema)
+            with avro.datafile.DataFileReader(open(path, 'rb'), datum_reader) as dfr:
+                self.assertEqual(records, list(dfr))
+
+    def test_incompatible_readers_schema(self):
+        """A datafile can't be opened with a reader's schema its data can't be read with."""
+        schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event", "fields": [{"name": "id", "type": "long"}]}""")
+        readers_schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event", "fields": [{"name": "name", "type": "string"}]}""")
+        path = self.tempfile()
+        with writer(path, schema) as dfw:
+            dfw.append({'id': 1})
+        with open(path, 'rb') as reader:
+            with self.assertRaises(avro.errors.SchemaResolutionException):
+                avro.datafile.DataFileReader(reader, avro.io.DatumReader(readers_schema=readers_schema))
+
+    def test_lazy_records(self):
+        """A datafile can be read as lazy records, decoding only the fields accessed."""
+        schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event",
+           "fields": [{"name": "id", "type": "long"},
+                      {"name": "samples", "type": {"type": "array", "items": "double"}},
+                      {"name": "name", "type": "string"}]}""")
+        records = [{'id': i, 'samples': [0.5] * i, 'name': str(i)} for i in range(10)]
+        path = self.tempfile()
+        with writer(path, schema) as dfw:
+            for record in records:
+                dfw.append(record)
+
+        with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(lazy=True)) as dfr:
+            lazy_records = list(dfr)
+        self.assertIsInstance(lazy_records[0], avro.io.LazyRecord)
+        self.assertEqual([record['name'] for record in lazy_records], [str(i) for i in range(10)])
+        self.assertEqual(lazy_records, records)
+
+    def test_parallel(self):
+        """A datafile can be decoded a block at a time in a pool of processes."""
+        schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event",
+           "fields": [{"name": "id", "type": "long"}, {"name": "name", "type": "string"}]}""")
+        records = [{'id': i, 'name': str(i)} for i in range(100)]
+        for codec in CODECS_TO_VALIDATE:
+            path = self.tempfile()
+            with writer(path, schema, codec) as dfw:
+                for record in records:
+                    dfw.append(record)
+                    if record['id'] % 7 == 6:
+                        dfw.sync()
+
+            datum_reader = avro.io.DatumReader(compiled=True, intern_strings=True, string_cache_size=16)
+            with avro.datafile.DataFileReader(open(path, 'rb'), datum_reader) as dfr:
+                self.assertEqual(records[:3], [next(dfr) for _ in range(3)])
+                self.assertEqual(records[3:], list(dfr.iter_parallel(workers=2)))
+            with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(),
+                                              fields=['id']) as dfr:
+                blocks = list(dfr.iter_parallel(workers=2, ordered=False, batches=True))
+            self.assertEqual([7] * 14 + [2], sorted((len(block) for block in blocks), reverse=True))
+            self.assertEqual([{'id': i} for i in range(100)], sorted(itertools.chain(*blocks), key=lambda r: r['id']))
+
+        with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(lazy=True)) as dfr:
+            self.assertRaises(avro.errors.UsageError, next, dfr.iter_parallel())
+
+    @unittest.skipUnless(avro.datafile.has_numpy, 'numpy is not installed')
+    def test_columns(self):
+        """A datafile can be read a block at a time into NumPy columns."""
+        writers_schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event",
+           "fields": [{"name": "id", "type": "long"},
+                      {"name": "ratio", "type": ["null", "double"]},
+                      {"name": "name", "type": "string"},
+                      {"name": "at", "type": {"type": "long", "logicalType": "timestamp-millis"}},
+                      {"name": "tags", "type": {"type": "array", "items": "string"}}]}""")
+        readers_schema = avro.schema.parse("""\
+          {"type": "record", "name": "Event",
+           "fields": [{"name": "at", "type": {"type": "long", "logicalType": "timestamp-millis"}},
+                      {"name": "ratio", "type": ["null", "double"]},
+                      {"name": "id", "type": "double"},
+                      {"name": "name", "type": "string"},
+                      {"name": "ok", "type": "boolean", "default": true},
+                      {"name": "labels", "type": {"type": "array", "items": "string"}, "default": []}]}""")
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=avro.timezones.utc)
+        records = [{'id': i, 'ratio': None if i % 3 else i / 2, 'name': str(i),
+                    'at': epoch + datetime.timedelta(milliseconds=i), 'tags': ['a'] * i}
+                   for i in range(100)]
+        path = self.tempfile()
+        with writer(path, writers_schema, 'deflate') as dfw:
+            for i, record in enumerate(records):
+                dfw.append(record)
+                if i == 40:
+                    dfw.sync()
+
+        with avro.datafile.DataFileReader(open(path, 'rb'), avro.io.DatumReader(readers_schema=readers_schema)) as dfr:
+            blocks = list(dfr.iter_columns())
+        self.assertEqual([41, 59], [len(block['id']) for block in blocks])
+        self.assertEqual(['at', 'ratio', 'id', 'name', 'ok', 'labels'], list(blocks[0]))
+        id_column = blocks[1]['id']
+        self.assertEqual('float64', id_column.dtype)
+        self.assertEqual(list(range(41, 100)), id_column.tolist())
+        self.assertEqual('datetime64[ms]', blocks[0]['at'].dtype)
+        self.assertEqual(3, blocks[0]['at'][3].astype('int64'))
+        self.assertEqual([0.0, None, None, 1.5], blocks[0]['ratio'][:4].tolist())
+        self.assertEqual(['0', '1'], blocks[0]['name'][:2].tolist())
+        self.assertTrue(blocks[1]['ok'].all())
+        self.assertEqual([], blocks[0]['labels'][0])
+        self.assertIsNot(blocks[0]['labels'][0], blocks[0]['labels'][1])
+
     def test_context_manager(self):
         '''A datafile closes its buffer object when it exits a with block.'''
         path = self.tempfile()
@@ -163,18 +163,18 @@ def print_test_name(test_name):
     print('')
 
 
-def write_datum(datum, writers_schema):
+def write_datum(datum, writers_schema, compiled=False, validation=avro.io.VALIDATE_FULL):
     writer = io.BytesIO()
     encoder = avro.io.BinaryEncoder(writer)
-    datum_writer = avro.io.DatumWriter(writers_schema)
+    datum_writer = avro.io.DatumWriter(writers_schema, compiled=compiled, validation=validation)
     datum_writer.write(datum, encoder)
     return writer, encoder, datum_writer
 
 
-def read_datum(buffer, writers_schema, readers_schema=None):
+def read_datum(buffer, writers_schema, readers_schema=None, compiled=False):
     reader = io.BytesIO(buffer.getvalue())
     decoder = avro.io.BinaryDecoder(reader)
-    datum_reader = avro.io.DatumReader(writers_schema, readers_schema)
+    datum_reader = avro.io.DatumReader(writers_schema, readers_schema, compiled=compiled)
     return datum_reader.read(decoder)
 
 
@@ -323,6 +323,25 @@ class TestIO(unittest.TestCase):
         datum_reader = avro.io.DatumReader(writers_schema, readers_schema)
         self.assertRaises(avro.errors.SchemaResolutionException, datum_reader.read, decoder)
 
+    def test_unknown_symbol_default(self):
+        print_test_name('TEST UNKNOWN SYMBOL DEFAULT')
+        writers_schema = avro.schema.parse("""\
+      {"type": "enum", "name": "Test",
+       "symbols": ["FOO", "BAR"]}""")
+        readers_schema = avro.schema.parse("""\
+      {"type": "enum", "name": "Test",
+       "symbols": ["BAR", "BAZ"], "default": "BAZ"}""")
+        self.assertEqual(readers_schema.reader_symbols(writers_schema), ('BAZ', 'BAR'))
+        # Writers with the same symbols share their table, other writers get their own.
+        same_writers_schema = avro.schema.make_avsc_object({"type": "enum", "name": "Test", "symbols": ["FOO", "BAR"]})
+        self.assertIs(readers_schema.reader_symbols(same_writers_schema), readers_schema.reader_symbols(writers_schema))
+        other_writers_schema = avro.schema.make_avsc_object({"type": "enum", "name": "Test", "symbols": ["BAR", "FOO"]})
+        self.assertEqual(readers_schema.reader_symbols(other_writers_schema), ('BAR', 'BAZ'))
+        for datum_to_write, datum_expected in (('FOO', 'BAZ'), ('BAR', 'BAR')):
+            writer, encoder, datum_writer = write_datum(datum_to_write, writers_schema)
+            for compiled in (False, True):
+                self.assertEqual(read_datum(writer, writers_schema, readers_schema, compiled), datum_expected)
+
     def test_default_value(self):
         print_test_name('TEST DEFAULT VALUE')
         writers_schema = LONG_RECORD_SCHEMA
@@ -343,6 +362,59 @@ class TestIO(unittest.TestCase):
                 correct += 1
         self.assertEqual(correct, len(DEFAULT_VALUE_EXAMPLES))
 
+    def test_default_value_copies(self):
+        print_test_name('TEST DEFAULT VALUE COPIES')
+        writers_schema = LONG_RECORD_SCHEMA
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "H", "type": {"type": "array", "items": "int"}, "default": [1]},
+                  {"name": "I", "type": "string", "default": "i"}]}""")
+        writer, encoder, datum_writer = write_datum(LONG_RECORD_DATUM, writers_schema)
+        for compiled in (False, True):
+            datum_reader = avro.io.DatumReader(writers_schema, readers_schema, compiled=compiled)
+            first = datum_reader.read(avro.io.BinaryDecoder(io.BytesIO(writer.getvalue())))
+            first['H'].append(2)
+            second = datum_reader.read(avro.io.BinaryDecoder(io.BytesIO(writer.getvalue())))
+            self.assertEqual(second, {'H': [1], 'I': 'i'})
+            self.assertIs(first['I'], second['I'])
+
+    def test_check_schemas(self):
+        print_test_name('TEST CHECK SCHEMAS')
+        writers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "A", "type": {"type": "array", "items": {"type": "record", "name": "Item",
+                                                              "fields": [{"name": "B", "type": ["null", "int"]}]}}}]}""")
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "A", "type": {"type": "array", "items": {"type": "record", "name": "Item",
+                                                              "fields": [{"name": "B", "type": "string"}]}}}]}""")
+        datum_reader = avro.io.DatumReader(writers_schema, readers_schema)
+        with self.assertRaises(avro.errors.SchemaResolutionException) as context:
+            datum_reader.check_schemas()
+        self.assertIn('Schemas do not match. at /A/[]/B', str(context.exception))
+
+        # Some branches of the writer's union can be read: the data decides.
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "A", "type": {"type": "array", "items": {"type": "record", "name": "Item",
+                                                              "fields": [{"name": "B", "type": ["null", "string"]}]}}}]}""")
+        avro.io.DatumReader(writers_schema, readers_schema).check_schemas()
+        writer, encoder, datum_writer = write_datum({'A': [{'B': None}]}, writers_schema)
+        self.assertEqual(read_datum(writer, writers_schema, readers_schema), {'A': [{'B': None}]})
+
+        # A pair of schemas failing in a union branch still fails where it is met again outside a union.
+        writers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "u", "type": [{"type": "record", "name": "X", "fields": [{"name": "v", "type": "int"}]}, "null"]},
+                  {"name": "x", "type": "X"}]}""")
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "u", "type": ["null", {"type": "record", "name": "X", "fields": [{"name": "v", "type": "string"}]}]},
+                  {"name": "x", "type": "X"}]}""")
+        with self.assertRaises(avro.errors.SchemaResolutionException) as context:
+            avro.io.DatumReader(writers_schema, readers_schema).check_schemas()
+        self.assertIn('Schemas do not match. at /x/v', str(context.exception))
+
     def test_no_default_value(self):
         print_test_name('TEST NO DEFAULT VALUE')
         writers_schema = LONG_RECORD_SCHEMA
@@ -390,6 +462,281 @@ class TestIO(unittest.TestCase):
         print('Datum Read: %s' % datum_read)
         self.assertEqual(datum_to_read, datum_read)
 
+    def test_compiled_reader(self):
+        print_test_name('TEST COMPILED READER')
+        for example_schema, datum in SCHEMAS_TO_VALIDATE:
+            writers_schema = avro.schema.parse(example_schema)
+            writer, encoder, datum_writer = write_datum(datum, writers_schema)
+            self.assertEqual(read_datum(writer, writers_schema),
+                             read_datum(writer, writers_schema, compiled=True))
+
+    def test_compiled_reader_resolution(self):
+        print_test_name('TEST COMPILED READER RESOLUTION')
+        writer, encoder, datum_writer = write_datum(LONG_RECORD_DATUM, LONG_RECORD_SCHEMA)
+        for field_type, default_json, default_datum in DEFAULT_VALUE_EXAMPLES:
+            readers_schema = avro.schema.parse("""\
+        {"type": "record", "name": "Test",
+         "fields": [{"name": "F", "type": ["null", "long"]},
+                    {"name": "A", "type": "double"},
+                    {"name": "H", "type": %s, "default": %s}]}
+        """ % (field_type, default_json))
+            datum_read = read_datum(writer, LONG_RECORD_SCHEMA, readers_schema, compiled=True)
+            self.assertEqual({'F': 6, 'A': 1, 'H': default_datum}, datum_read)
+            self.assertEqual(read_datum(writer, LONG_RECORD_SCHEMA, readers_schema), datum_read)
+
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "H", "type": "int"}]}""")
+        self.assertRaises(avro.errors.SchemaResolutionException,
+                          read_datum, writer, LONG_RECORD_SCHEMA, readers_schema, True)
+
+    def test_buffer_decoder(self):
+        print_test_name('TEST BUFFER DECODER')
+        for example_schema, datum in SCHEMAS_TO_VALIDATE:
+            writers_schema = avro.schema.parse(example_schema)
+            writer, encoder, datum_writer = write_datum(datum, writers_schema)
+            for compiled in (False, True):
+                datum_reader = avro.io.DatumReader(writers_schema, compiled=compiled)
+                decoder = avro.io.BufferDecoder(writer.getvalue())
+                self.assertEqual(read_datum(writer, writers_schema), datum_reader.read(decoder))
+                self.assertEqual(len(writer.getvalue()), decoder.position)
+
+    def test_buffer_decoder_skip(self):
+        for value_to_skip, hex_encoding in BINARY_ENCODINGS:
+            buffer = binascii.unhexlify(hex_encoding.replace(b' ', b'')) + b'\x02\x01\xff\x00\x00\x80\x3f'
+            decoder = avro.io.BufferDecoder(memoryview(buffer))
+            decoder.skip_long()
+            self.assertEqual(1, decoder.read_long())
+            self.assertTrue(decoder.read_boolean())
+            decoder.skip(1)
+            self.assertEqual(1.0, decoder.read_float())
+            self.assertEqual(value_to_skip, avro.io.BufferDecoder(buffer).read_long())
+
+    def test_buffer_encoder(self):
+        print_test_name('TEST BUFFER ENCODER')
+        for example_schema, datum in SCHEMAS_TO_VALIDATE:
+            writers_schema = avro.schema.parse(example_schema)
+            writer, encoder, datum_writer = write_datum(datum, writers_schema)
+            for compiled in (False, True):
+                encoder = avro.io.BufferEncoder()
+                avro.io.DatumWriter(writers_schema, compiled=compiled).write(datum, encoder)
+                self.assertEqual(writer.getvalue(), encoder.getvalue())
+
+        for datum in (0, -1, 1, 1023, -1024, 1024, -1025, 1 << 40, -(1 << 63), (1 << 63) - 1):
+            writer = io.BytesIO()
+            avro.io.BinaryEncoder(writer).write_long(datum)
+            encoder = avro.io.BufferEncoder()
+            encoder.write_long(datum)
+            self.assertEqual(writer.getvalue(), bytes(encoder.buffer))
+            self.assertEqual(datum, avro.io.BufferDecoder(encoder.buffer).read_long())
+
+    def test_sized_blocks(self):
+        print_test_name('TEST SIZED BLOCKS')
+        writers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "A", "type": {"type": "array", "items": {"type": "map", "values": "string"}}},
+                  {"name": "B", "type": "int"}]}""")
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "B", "type": "int"}]}""")
+        datum = {'A': [{'k%d' % j: 'v' * j for j in range(i)} for i in range(7)], 'B': 42}
+        for compiled in (False, True):
+            writer = io.BytesIO()
+            datum_writer = avro.io.DatumWriter(writers_schema, compiled=compiled, sized_blocks=True, max_block_count=3)
+            datum_writer.write(datum, avro.io.BinaryEncoder(writer))
+            decoder = avro.io.BufferDecoder(writer.getvalue())
+            self.assertEqual(-3, decoder.read_long())
+            self.assertEqual(datum, read_datum(writer, writers_schema, compiled=compiled))
+            self.assertEqual({'B': 42}, read_datum(writer, writers_schema, readers_schema, compiled=compiled))
+        for datum in ({'A': [], 'B': 42}, {'A': [{}], 'B': 42}):
+            for compiled in (False, True):
+                writer = io.BytesIO()
+                datum_writer = avro.io.DatumWriter(writers_schema, compiled=compiled, sized_blocks=True)
+                datum_writer.write(datum, avro.io.BinaryEncoder(writer))
+                self.assertEqual(datum, read_datum(writer, writers_schema, compiled=compiled))
+                self.assertEqual({'B': 42}, read_datum(writer, writers_schema, readers_schema, compiled=compiled))
+
+    def test_compiled_writer(self):
+        print_test_name('TEST COMPILED WRITER')
+        for example_schema, datum in SCHEMAS_TO_VALIDATE:
+            writers_schema = avro.schema.parse(example_schema)
+            writer, encoder, datum_writer = write_datum(datum, writers_schema)
+            compiled_writer, encoder, datum_writer = write_datum(datum, writers_schema, compiled=True)
+            self.assertEqual(writer.getvalue(), compiled_writer.getvalue())
+
+    def test_union_branch_resolution(self):
+        print_test_name('TEST UNION BRANCH RESOLUTION')
+        writers_schema = avro.schema.parse("""\
+      ["null", "boolean", "long", "double", "string",
+       {"type": "int", "logicalType": "date"},
+       {"type": "record", "name": "R", "fields": [{"name": "f", "type": "int"}]},
+       {"type": "map", "values": "int"}]""")
+        for datum, index in ((None, 0), (True, 1), (5, 2), (2 ** 40, 2), (1.5, 3), ('x', 4),
+                             (datetime.date(2020, 1, 1), 5), ({'f': 1}, 6), ({'g': 1}, 7)):
+            self.assertEqual(writers_schema.branch_index(datum), index)
+            writer, encoder, datum_writer = write_datum(datum, writers_schema)
+            compiled_writer, encoder, datum_writer = write_datum(datum, writers_schema, compiled=True)
+            self.assertEqual(writer.getvalue(), compiled_writer.getvalue())
+            self.assertEqual(read_datum(writer, writers_schema), datum)
+        self.assertIsNone(writers_schema.branch_index(b'x'))
+        self.assertRaises(avro.errors.AvroTypeException, write_datum, b'x', writers_schema)
+        self.assertRaises(avro.errors.AvroTypeException, write_datum, b'x', writers_schema, True)
+
+        # Exact Python types win over wider branches listed before them.
+        for union, datum, index in (('["null", "long", "boolean"]', True, 2), ('["null", "double", "long"]', 5, 2),
+                                    ('["null", "double", "long"]', 5.0, 1), ('["null", "int", "long"]', 2 ** 40, 2)):
+            writers_schema = avro.schema.parse(union)
+            self.assertEqual(writers_schema.branch_index(datum), index)
+            for compiled in (False, True):
+                writer, encoder, datum_writer = write_datum(datum, writers_schema, compiled)
+                read = read_datum(writer, writers_schema, compiled=compiled)
+                self.assertEqual((type(read), read), (type(datum), datum))
+
+    def test_validation_modes(self):
+        print_test_name('TEST VALIDATION MODES')
+        for example_schema, datum in SCHEMAS_TO_VALIDATE:
+            writers_schema = avro.schema.parse(example_schema)
+            writer, encoder, datum_writer = write_datum(datum, writers_schema)
+            for compiled in (False, True):
+                for validation in (avro.io.VALIDATE_INLINE, avro.io.VALIDATE_NONE):
+                    other_writer, encoder, datum_writer = write_datum(datum, writers_schema, compiled, validation)
+                    self.assertEqual(writer.getvalue(), other_writer.getvalue())
+        self.assertRaises(avro.errors.UsageError, avro.io.DatumWriter, validation='sometimes')
+
+    def test_inline_validation_path(self):
+        print_test_name('TEST INLINE VALIDATION PATH')
+        writers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "F", "type": "int"},
+                  {"name": "A", "type": {"type": "array", "items": {"type": "map", "values": ["null", "long"]}}}]}""")
+        datum = {'F': 1, 'A': [{'x': 1}, {'y': None, 'z': 'Bad'}]}
+        for compiled in (False, True):
+            with self.assertRaises(avro.errors.AvroTypeException) as context:
+                write_datum(datum, writers_schema, compiled, avro.io.VALIDATE_INLINE)
+            self.assertEqual(context.exception.path, ['A', 1, 'z'])
+            self.assertEqual(context.exception.datum, 'Bad')
+            self.assertIn('At path: /A/1/z', str(context.exception))
+
+    def test_record_class(self):
+        print_test_name('TEST RECORD CLASS')
+        writers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Outer",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "inner", "type": ["null", {"type": "record", "name": "Inner",
+                                                      "fields": [{"name": "class", "type": "string"}]}]}]}""")
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Outer",
+       "fields": [{"name": "inner", "type": ["null", {"type": "record", "name": "Inner",
+                                                      "fields": [{"name": "class", "type": "string"}]}]},
+                  {"name": "extra", "type": {"type": "record", "name": "Extra", "fields": [{"name": "n", "type": "int"}]},
+                   "default": {"n": 7}}]}""")
+        datum = {'id': 1, 'inner': {'class': 'A'}}
+        writer, encoder, datum_writer = write_datum(datum, writers_schema)
+        Outer = readers_schema.record_class()
+        Inner = readers_schema.fields[0].type.schemas[1].record_class()
+        Extra = readers_schema.fields[1].type.record_class()
+        expected = Outer(Inner('A'), Extra(n=7))
+        self.assertIs(Outer, readers_schema.record_class())
+        self.assertEqual(repr(expected), "Outer(inner=Inner(class='A'), extra=Extra(n=7))")
+        self.assertFalse(hasattr(expected, '__dict__'))
+        for compiled in (False, True):
+            reader = io.BytesIO(writer.getvalue())
+            datum_reader = avro.io.DatumReader(writers_schema, readers_schema, compiled=compiled,
+                                               record_factory=avro.schema.RecordSchema.record_class)
+            datum_read = datum_reader.read(avro.io.BinaryDecoder(reader))
+            self.assertEqual(datum_read, expected)
+
+            # Records read as instances of record classes can be written back.
+            written, encoder, datum_writer = write_datum(datum_read, readers_schema, compiled)
+            self.assertEqual(read_datum(written, readers_schema), {'inner': {'class': 'A'}, 'extra': {'n': 7}})
+        self.assertFalse(avro.io.validate(readers_schema, Outer(Inner(1), Extra(7))))
+
+        # Fields may be named like the instance or arguments of a method, but not like private names.
+        unusual_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Unusual",
+       "fields": [{"name": "self", "type": "int"}, {"name": "args", "type": "int"}, {"name": "_0", "type": "int"}]}""")
+        Unusual = unusual_schema.record_class()
+        self.assertEqual(repr(Unusual(1, 2, _0=3)), 'Unusual(self=1, args=2, _0=3)')
+        self.assertEqual(repr(Unusual(self=1, args=2, _0=3)), 'Unusual(self=1, args=2, _0=3)')
+        private_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Private", "fields": [{"name": "__value", "type": "int"}]}""")
+        self.assertRaises(avro.errors.SchemaParseException, private_schema.record_class)
+
+    def test_lazy_record(self):
+        print_test_name('TEST LAZY RECORD')
+        writers_schema = LONG_RECORD_SCHEMA
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "E", "type": "int"},
+                  {"name": "H", "type": "string", "default": "h"},
+                  {"name": "A", "type": "int"}]}""")
+        writer, encoder, datum_writer = write_datum(LONG_RECORD_DATUM, writers_schema)
+        decoder = avro.io.BufferDecoder(writer.getvalue())
+        datum_reader = avro.io.DatumReader(writers_schema, readers_schema, lazy=True)
+        datum_read = datum_reader.read(decoder)
+        self.assertEqual(decoder.position, len(writer.getvalue()))
+        self.assertEqual(list(datum_read), ['E', 'H', 'A'])
+        self.assertEqual(datum_read['A'], 1)
+        self.assertEqual(datum_read, {'E': 5, 'H': 'h', 'A': 1})
+        self.assertRaises(KeyError, datum_read.__getitem__, 'B')
+        self.assertRaises(avro.errors.UsageError, datum_reader.read, avro.io.BinaryDecoder(io.BytesIO(writer.getvalue())))
+
+    def test_intern_strings(self):
+        print_test_name('TEST INTERN STRINGS')
+        writers_schema = avro.schema.parse("""\
+      {"type": "array", "items": {"type": "record", "name": "Test",
+       "fields": [{"name": "country", "type": "string"},
+                  {"name": "name", "type": "string"}]}}""")
+        readers_schema = avro.schema.parse("""\
+      {"type": "array", "items": {"type": "record", "name": "Test",
+       "fields": [{"name": "country", "type": {"type": "string", "avro.python.intern": true}},
+                  {"name": "name", "type": "string"}]}}""")
+        datum = [{'country': 'NZ', 'name': 'a' * 100}, {'country': 'NZ', 'name': 'a' * 100}]
+        writer, encoder, datum_writer = write_datum(datum, writers_schema)
+        for compiled in (False, True):
+            datum_reader = avro.io.DatumReader(writers_schema, readers_schema, compiled=compiled)
+            first, second = datum_reader.read(avro.io.BinaryDecoder(io.BytesIO(writer.getvalue())))
+            self.assertEqual([first, second], datum)
+            self.assertIs(first['country'], second['country'])
+            self.assertIsNot(first['name'], second['name'])
+            self.assertEqual(len(datum_reader.string_cache), 1)
+
+    def test_string_cache_eviction(self):
+        print_test_name('TEST STRING CACHE EVICTION')
+        cache = avro.io.StringCache(max_size=2)
+        datum_reader = avro.io.DatumReader(intern_strings=True, string_cache_size=2)
+        self.assertTrue(datum_reader.intern_strings)
+        self.assertEqual(datum_reader.string_cache_size, 2)
+        decoder = avro.io.BufferDecoder(b'\x02a\x02b\x02c\x02a')
+        self.assertEqual([cache.read_utf8(decoder) for _ in range(4)], ['a', 'b', 'c', 'a'])
+        self.assertEqual(len(cache), 2)
+
+    def test_single_object_encoding(self):
+        print_test_name('TEST SINGLE OBJECT ENCODING')
+        writers_schema = LONG_RECORD_SCHEMA
+        readers_schema = avro.schema.parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "E", "type": "int"},
+                  {"name": "H", "type": "string", "default": "h"}]}""")
+        message = avro.io.SingleObjectEncoder(writers_schema).encode(LONG_RECORD_DATUM)
+        self.assertEqual(message[:10], b'\xc3\x01' + writers_schema.fingerprint())
+        writer, encoder, datum_writer = write_datum(LONG_RECORD_DATUM, writers_schema)
+        self.assertEqual(message[10:], writer.getvalue())
+
+        found = []
+
+        def find(fingerprint):
+            found.append(fingerprint)
+            return writers_schema if fingerprint == writers_schema.fingerprint() else None
+        decoder = avro.io.SingleObjectDecoder(avro.io.SchemaStore(find=find), readers_schema)
+        for _ in range(2):
+            self.assertEqual(decoder.decode(message), {'E': 5, 'H': 'h'})
+        self.assertEqual(found, [writers_schema.fingerprint()])
+
+        self.assertRaises(avro.errors.AvroException, decoder.decode, b'\xc3\x00' + message[2:])
+        unknown = avro.io.SingleObjectEncoder(readers_schema).encode({'E': 1, 'H': 'x'})
+        self.assertRaises(avro.errors.AvroException, decoder.decode, unknown)
+
     def test_type_exception(self):
         print_test_name('TEST TYPE EXCEPTION')
         writers_schema = avro.schema.parse("""\
@@ -398,6 +745,7 @@ class TestIO(unittest.TestCase):
                   {"name": "E", "type": "int"}]}""")
         datum_to_write = {'E': 5, 'F': 'Bad'}
         self.assertRaises(avro.errors.AvroTypeException, write_datum, datum_to_write, writers_schema)
+        self.assertRaises(avro.errors.AvroTypeException, write_datum, datum_to_write, writers_schema, True)
 
 
 if __name__ == '__main__':
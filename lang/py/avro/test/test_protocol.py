@@ -270,6 +270,13 @@ class TestMisc(unittest.TestCase):
         greeting_type = proto.types_dict['Greeting']
         self.assertEqual(greeting_type.namespace, 'com.acme')
 
+    def test_parse_cache(self):
+        """Parsing the same JSON text again returns the same protocol."""
+        protocol_json = str(HELLO_WORLD.parse())
+        self.assertIs(avro.protocol.parse(protocol_json), avro.protocol.parse(protocol_json))
+        message = avro.protocol.parse(protocol_json).messages['hello']
+        self.assertTrue(message.request.frozen and message.response.frozen and message.errors.frozen)
+
     def test_inner_namespace_not_rendered(self):
         proto = HELLO_WORLD.parse()
         self.assertEqual('com.acme.Greeting', proto.types[0].fullname)
@@ -21,7 +21,9 @@
 
 """Test the schema parsing logic."""
 
+import hashlib
 import json
+import operator
 import unittest
 import warnings
 from typing import List
@@ -77,12 +79,14 @@ FIXED_EXAMPLES = [
 ENUM_EXAMPLES = [
     ValidTestSchema({"type": "enum", "name": "Test", "symbols": ["A", "B"]}),
     ValidTestSchema({"type": "enum", "name": "AVRO2174", "symbols": ["nowhitespace"]}),
+    ValidTestSchema({"type": "enum", "name": "Test", "symbols": ["A", "B"], "default": "B"}),
     InvalidTestSchema({"type": "enum", "name": "Status", "symbols": "Normal Caution Critical"}),
     InvalidTestSchema({"type": "enum", "name": [0, 1, 1, 2, 3, 5, 8],
                        "symbols": ["Golden", "Mean"]}),
     InvalidTestSchema({"type": "enum", "symbols": ["I", "will", "fail", "no", "name"]}),
     InvalidTestSchema({"type": "enum", "name": "Test", "symbols": ["AA", "AA"]}),
     InvalidTestSchema({"type": "enum", "name": "AVRO2174", "symbols": ["white space"]}),
+    InvalidTestSchema({"type": "enum", "name": "Test", "symbols": ["A", "B"], "default": "C"}),
 ]
 
 ARRAY_EXAMPLES = [
@@ -329,6 +333,131 @@ class TestMisc(unittest.TestCase):
         # If we've made it this far, the subschema was reasonably stringified; it ccould be reparsed.
         self.assertEqual("X", t.fields[0].type.name)
 
+    def test_canonical_form(self):
+        """Schemas have a Parsing Canonical Form, with full names and without attributes irrelevant to reading."""
+        cases = [
+            ({"type": "int"}, '"int"'),
+            ({"type": "long", "logicalType": "timestamp-millis"}, '"long"'),
+            ({"type": "array", "items": {"type": "map", "values": "string"}},
+             '{"type":"array","items":{"type":"map","values":"string"}}'),
+            (["null", {"type": "fixed", "name": "MD5", "namespace": "org.example", "size": 16}],
+             '["null",{"name":"org.example.MD5","type":"fixed","size":16}]'),
+            ({"type": "enum", "name": "Test", "symbols": ["A", "B"], "doc": "Doc String"},
+             '{"name":"Test","type":"enum","symbols":["A","B"]}'),
+            ({"type": "error", "name": "Oops", "namespace": "x", "doc": "d",
+              "fields": [{"name": "code", "type": "int", "default": 0},
+                         {"name": "cause", "type": ["null", "x.Oops"]}]},
+             '{"name":"x.Oops","type":"record","fields":[{"name":"code","type":"int"},'
+             '{"name":"cause","type":["null","x.Oops"]}]}'),
+        ]
+        for schema_json, canonical_form in cases:
+            self.assertEqual(avro.schema.parse(json.dumps(schema_json)).canonical_form, canonical_form)
+        # Strings are written as they are, not as escapes, so fingerprints match the other implementations.
+        record = avro.schema.parse(json.dumps({"type": "record", "name": "Test", "fields": [{"name": "caf\u00e9", "type": "int"}]}))
+        self.assertEqual(record.canonical_form, '{"name":"Test","type":"record","fields":[{"name":"caf\u00e9","type":"int"}]}')
+        schema = avro.schema.parse(json.dumps({"type": "enum", "name": "E", "symbols": ["\u00e9t\u00e9"]}), validate_enum_symbols=False)
+        self.assertEqual(schema.canonical_form, '{"name":"E","type":"enum","symbols":["\u00e9t\u00e9"]}')
+        self.assertEqual(schema.fingerprint('MD5'), hashlib.md5(schema.canonical_form.encode('utf-8')).digest())
+
+    def test_fingerprint(self):
+        """Schemas are fingerprinted with CRC-64-AVRO by default, or with other digests."""
+        schema = avro.schema.parse('{"type": "int"}')
+        self.assertEqual(schema.fingerprint().hex(), '8f5c393f1ad57572')
+        self.assertEqual(schema.fingerprint('MD5').hex(), 'ef524ea1b91e73173d938ade36c1db32')
+        self.assertEqual(schema.fingerprint('sha256').hex(),
+                         '3f2b87a9fe7cc9b13835598c3981cd45e3e355309e5090aa0933d7becb6fba45')
+        self.assertIs(schema.fingerprint(), schema.fingerprint())
+        self.assertRaises(avro.errors.UsageError, schema.fingerprint, 'UNKNOWN')
+        record = avro.schema.parse(json.dumps({"fields": [], "type": "record", "name": "foo", "namespace": "x.y"}))
+        self.assertEqual(int.from_bytes(record.fingerprint(), 'little', signed=True), 5916914534497305771)
+
+    def test_parse_cache(self):
+        """Parsing the same JSON text again returns the same schema, and the same warnings."""
+        schema_json = json.dumps({"type": "string", "logicalType": "uuid"})
+        for _ in range(2):
+            with warnings.catch_warnings(record=True) as actual_warnings:
+                warnings.simplefilter('always')
+                schema = avro.schema.parse(schema_json)
+            self.assertEqual([str(warning.message) for warning in actual_warnings], ['Unknown uuid, using string.'])
+        self.assertIs(schema, avro.schema.parse(schema_json))
+        self.assertIsNot(schema, avro.schema.parse(schema_json, validate_enum_symbols=False))
+
+    def test_frozen(self):
+        """Parsed schemas are frozen, and equal schemas hash alike whatever their JSON text."""
+        schema = avro.schema.parse(json.dumps({"type": "record", "name": "Test",
+                                               "fields": [{"name": "f", "type": {"type": "array", "items": "int"}}]}))
+        same = avro.schema.parse(json.dumps({"name": "Test", "type": "record",
+                                             "fields": [{"type": {"items": "int", "type": "array"}, "name": "f"}]}))
+        self.assertTrue(schema.frozen and schema.fields[0].frozen and schema.fields[0].type.items.frozen)
+        self.assertRaises(avro.errors.AvroException, schema.set_prop, 'doc', 'changed')
+        self.assertRaises(avro.errors.AvroException, schema.fields[0].type.items.set_prop, 'type', 'long')
+        self.assertIs(str(schema), str(schema))
+        schema.to_json()['fields'].append({"name": "g", "type": "int"})
+        self.assertEqual(1, len(schema.to_json()['fields']))
+        self.assertRaises(TypeError, operator.setitem, schema.props, 'doc', 'changed')
+        self.assertEqual(schema, same)
+        self.assertEqual({schema: 1}[same], 1)
+        self.assertEqual(schema.fields[0], same.fields[0])
+        self.assertNotEqual(schema, schema.fields[0].type)
+        self.assertNotEqual(schema, str(schema))
+        self.assertTrue(schema.project(['f']).frozen)
+        unfrozen = avro.schema.make_avsc_object({"type": "enum", "name": "E", "symbols": ["A"]})
+        self.assertFalse(unfrozen.frozen)
+        unfrozen.set_prop('doc', 'changed')
+        self.assertEqual(unfrozen.doc, 'changed')
+
+    def test_slots(self):
+        """Schemas, fields and names keep no instance dict, only their props and slots."""
+        schema = avro.schema.parse(json.dumps({
+            "type": "record", "name": "Test", "fields": [
+                {"name": "day", "type": {"type": "int", "logicalType": "date"}, "default": 0},
+                {"name": "kind", "type": ["null", {"type": "enum", "name": "Kind", "symbols": ["A"]}]}]}))
+        day, kind = schema.fields
+        for obj in (schema, day, kind, day.type, kind.type, kind.type.schemas[1], avro.schema.Name('a', None, None),
+                    avro.schema.Names()):
+            self.assertFalse(hasattr(obj, '__dict__'))
+        self.assertEqual((day.name, day.type.type, day.type.logical_type), ('day', 'int', 'date'))
+        self.assertIs(day.type, day.props['type'])
+        self.assertEqual((day.has_default, kind.has_default), (True, False))
+        self.assertEqual(kind.type.schemas[1].fullname, 'Kind')
+
+    def test_fields_dict(self):
+        """The fields of a record by name are only computed once."""
+        record = avro.schema.parse(json.dumps({"type": "record", "name": "Test",
+                                               "fields": [{"name": "f", "type": "int"}]}))
+        self.assertIs(record.fields_dict, record.fields_dict)
+        self.assertEqual(record.fields_dict, {'f': record.fields[0]})
+
+    def test_project(self):
+        """A record can be projected onto some of its fields, even nested or reused ones."""
+        s = avro.schema.parse(json.dumps({
+            "type": "record", "name": "Event", "namespace": "org.example",
+            "fields": [
+                {"name": "id", "type": "long"},
+                {"name": "origin", "type": {"type": "record", "name": "Point", "fields": [
+                    {"name": "x", "type": "double"}, {"name": "y", "type": "double"}]}},
+                {"name": "path", "type": {"type": "array", "items": "Point"}},
+                {"name": "user", "type": ["null", {"type": "record", "name": "User", "fields": [
+                    {"name": "name", "type": "string"}, {"name": "age", "type": "int"}]}]},
+            ]}))
+        projected = s.project(['user.age', 'path'])
+        self.assertEqual('org.example.Event', projected.fullname)
+        self.assertEqual(['path', 'user'], [f.name for f in projected.fields])
+        self.assertEqual(['x', 'y'], [f.name for f in projected.fields[0].type.items.fields])
+        self.assertEqual(['age'], [f.name for f in projected.fields[1].type.schemas[1].fields])
+        self.assertEqual(['id', 'origin'], [f.name for f in s.project(['id', 'origin.x', 'origin']).fields])
+        self.assertEqual(['x'], [f.name for f in s.project(['origin.x']).fields[0].type.fields])
+        for paths in (['origin.x', 'path'], ['path', 'origin.x'], ['origin.x', 'path.y']):
+            projected = s.project(paths)
+            self.assertEqual(['x', 'y'], [f.name for f in projected.fields[0].type.fields])
+            self.assertIs(projected.fields[0].type, projected.fields[1].type.items)
+        self.assertRaises(avro.errors.AvroException, s.project, ['id.value'])
+        self.assertRaises(avro.errors.AvroException, s.project, ['missing'])
+        self.assertRaises(avro.errors.AvroException, s.project, ['origin.z', 'path'])
+        nullable = avro.schema.parse(json.dumps({
+            "type": "record", "name": "Nullable", "fields": [{"name": "value", "type": ["null", "string"]}]}))
+        self.assertRaises(avro.errors.AvroException, nullable.project, ['value.length'])
+
     def test_name_is_none(self):
         """When a name is None its namespace is None."""
         self.assertIsNone(avro.schema.Name(None, None, None).fullname)